@@ -46,6 +46,12 @@ setup(
     entry_points={
         'gui_scripts': [
             'omission = omission.__main__:main'
+        ],
+        'console_scripts': [
+            'omission-pack = omission.game.contentpack:main',
+            'omission-simulate = omission.game.simulate:main',
+            'omission-replay = omission.game.journal:main',
+            'omission-scores = omission.data.score_history:main'
         ]
     }
 )
@@ -0,0 +1,120 @@
+"""
+Decoded Audio Cache [Omission]
+"""
+
+import hashlib
+import os
+import os.path
+import tempfile
+
+from appdirs import user_cache_dir
+
+# SoundFile is optional; without it, sounds are loaded from their OGG files.
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
+
+def default_cache_directory():
+    """
+    Return the path of the audio cache in the user's cache directory.
+    """
+    return os.path.join(user_cache_dir("Omission", "MousePaw Media"), "audio")
+
+def file_hash(path):
+    """
+    Return the SHA-256 hash of the file at path, in hex.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class AudioCache(object):
+    """
+    Keeps decoded (16-bit PCM WAV) copies of our compressed sounds, so they
+    needn't be decoded again every time the game starts. Each copy is named
+    for the hash of its source file, so a changed source gets a new copy.
+    Decoding requires SoundFile.
+    """
+
+    def __init__(self, directory=None):
+        """
+        Create a new AudioCache in directory, or in the user's cache
+        directory by default. Nothing is read or written yet.
+        """
+        if directory is None:
+            directory = default_cache_directory()
+        self.directory = directory
+        # The copies built, and the sources we couldn't decode.
+        self.builds = 0
+        self.failures = 0
+
+    def cached_path(self, source):
+        """
+        Return the path the decoded copy of the sound file at source has,
+        whether or not it exists yet.
+        """
+        stem = os.path.splitext(os.path.basename(source))[0]
+        return os.path.join(self.directory,
+                            stem + "-" + file_hash(source)[:32] + ".wav")
+
+    def get(self, source):
+        """
+        Return the path of the decoded copy of the sound file at source,
+        decoding it now if there isn't one. If it can't be decoded, return
+        source itself, to be loaded as it is.
+        """
+        try:
+            path = self.cached_path(source)
+        except OSError:
+            return source
+        if os.path.exists(path):
+            return path
+        if soundfile is None:
+            return source
+
+        try:
+            self._build(source, path)
+        except (OSError, RuntimeError):
+            # SoundFile raises RuntimeError for files it can't decode.
+            self.failures += 1
+            return source
+        self.builds += 1
+        return path
+
+    def _build(self, source, path):
+        """
+        Decode the sound file at source into a WAV file at path, removing
+        any copies of older versions of it.
+        """
+        os.makedirs(self.directory, 0o777, True)
+        data, samplerate = soundfile.read(source, dtype='int16')
+
+        # Write beside the final file and rename, so a half-written copy is
+        # never mistaken for a whole one.
+        handle, temppath = tempfile.mkstemp(dir=self.directory,
+                                            prefix=".audio-", suffix=".wav")
+        try:
+            with os.fdopen(handle, 'wb') as wavfile:
+                soundfile.write(wavfile, data, samplerate, format='WAV',
+                                subtype='PCM_16')
+            os.replace(temppath, path)
+        except BaseException:
+            try:
+                os.remove(temppath)
+            except OSError:
+                pass
+            raise
+
+        # Copies of other versions of this sound are stale now.
+        current = os.path.basename(path)
+        stem = current.rsplit("-", 1)[0]
+        for filename in os.listdir(self.directory):
+            if filename != current and filename.endswith(".wav") and \
+               filename.rsplit("-", 1)[0] == stem:
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
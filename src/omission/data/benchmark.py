@@ -0,0 +1,135 @@
+"""
+Data File Benchmark [Omission]
+"""
+
+import argparse
+import os
+import os.path
+import random
+import re
+import tempfile
+import time
+
+from omission.data.data_loader import DataLoader, Scoreboard
+
+def make_datafile(path, scoreboards, scores=8, seed=0):
+    """
+    Write a synthetic, compacted data file with the given number of
+    scoreboards, each holding the given number of scores.
+    """
+    rng = random.Random(seed)
+    lines = ["DEF=T:30:2:1:3:1:3:2:1", "DEF=S:5:1:1:3:2:1", "DEF=I:3:1:3:2:1",
+             "VOL=6", "DYS=0"]
+    for board in range(scoreboards):
+        lines.append("SCO=T:{}:2:1:3:1:3:2:1".format(board + 1))
+        for _ in range(scores):
+            lines.append(":{}:Player{}".format(rng.randint(1, 100000),
+                                               rng.randint(1, 99)))
+    output = "\n".join(lines) + "\n"
+    with open(path, 'w') as datafile:
+        datafile.write("SIZ=" + str(len(output.encode('utf-8'))) + "\n")
+        datafile.write(output)
+
+def legacy_parse(loader, path):
+    """
+    Parse the data file the way DataLoader used to: splitting it into
+    lines, then matching every line against regexes, once for the settings
+    and again for the scores.
+    """
+    with open(path) as scorefile:
+        data = re.split(r'\n', scorefile.read())
+
+    for line in data:
+        if re.match(r'DEF=.*', line):
+            tokens = re.split(r':', line)
+            if tokens[0] == "DEF=T":
+                loader.settings.timed.set_timed(int(tokens[1]), int(tokens[2]),
+                                                int(tokens[3]), int(tokens[4]))
+                loader.settings.timed.set_clues(int(tokens[5]), int(tokens[6]))
+                loader.settings.timed.set_chain(int(tokens[7]))
+                loader.settings.timed.set_solution_pause(bool(int(tokens[8])))
+            elif tokens[0] == "DEF=S":
+                loader.settings.survival.set_survival(int(tokens[1]),
+                                                      int(tokens[2]))
+                loader.settings.survival.set_clues(int(tokens[3]),
+                                                   int(tokens[4]))
+                loader.settings.timed.set_chain(int(tokens[5]))
+                loader.settings.survival.set_solution_pause(bool(int(tokens[6])))
+            elif tokens[0] == "DEF=I":
+                loader.settings.infinite.set_infinite(int(tokens[1]))
+                loader.settings.infinite.set_clues(int(tokens[2]),
+                                                   int(tokens[3]))
+                loader.settings.timed.set_chain(int(tokens[4]))
+                loader.settings.infinite.set_solution_pause(bool(int(tokens[5])))
+        elif re.match(r'VOL=.*', line):
+            tokens = re.split(r'=', line)
+            loader.soundplayer.set_volume(int(tokens[1]))
+        elif re.match(r'DYS=.*', line):
+            tokens = re.split(r'=', line)
+            loader.fontloader.set_dyslexic_mode(bool(int(tokens[1])))
+
+    datastring = ""
+    for line in data:
+        if re.match(r'SCO=.*', line):
+            datastring = line[4:]
+            loader.scoreboards[datastring] = Scoreboard(datastring)
+        elif re.match(r'^:.*$', line) and datastring != "":
+            tokens = re.split(r':', line[1:])
+            loader.scoreboards[datastring].add_score(int(tokens[0]), tokens[1])
+
+def current_parse(loader, path):
+    """
+    Parse the data file as DataLoader does at startup, indexing the
+    scoreboards without parsing them.
+    """
+    with open(path, 'rb') as scorefile:
+        loader.parse(scorefile.read())
+
+def full_parse(loader, path):
+    """
+    Parse the data file with DataLoader, and then every scoreboard in it.
+    """
+    current_parse(loader, path)
+    loader.load_scoreboards()
+
+def bench(parse, path, repeat=3):
+    """
+    Return the best seconds of several parses of the data file, each into
+    a fresh DataLoader with no data of its own.
+    """
+    best = None
+    for _ in range(repeat):
+        loader = DataLoader(path + ".empty")
+        started = time.perf_counter()
+        parse(loader, path)
+        elapsed = time.perf_counter() - started
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def main():
+    """
+    Compare the old and new data file parsers from the command line.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark parsing the Omission data file.")
+    parser.add_argument('sizes', nargs='*', type=int,
+                        default=[10, 1000, 10000, 100000],
+                        help="numbers of scoreboards to try")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "scores.data")
+
+        print("{:>12}  {:>10}  {:>10}  {:>8}  {:>10}".format(
+            "scoreboards", "legacy", "full", "speedup", "startup"))
+        for size in args.sizes:
+            make_datafile(path, size)
+            legacy = bench(legacy_parse, path)
+            full = bench(full_parse, path)
+            startup = bench(current_parse, path)
+            print("{:>12}  {:>9.3f}s  {:>9.3f}s  {:>7.1f}x  {:>9.4f}s".format(
+                size, legacy, full, legacy / full, startup))
+
+if __name__ == '__main__':
+    main()
@@ -4,12 +4,17 @@ Data (Scores and Settings) Loader [Omission]
 
 from collections import OrderedDict
 import copy
+import heapq
+import itertools
 import os.path
 import re
+import threading
 
 from appdirs import user_data_dir
 
+from omission.data.data_writer import DataWriter
 from omission.data.font_loader import FontLoader
+from omission.data.score_journal import ScoreJournal
 from omission.data.sound import SoundPlayer
 from omission.game.gameround import GameRoundSettings
 
@@ -25,133 +30,352 @@ from omission.game.gameround import GameRoundSettings
 # :5832:Jarek
 # :100:Bob
 # SCO=T:5:2:3:1:30:3:1
+#
+# Changes are appended to the end of the file in the same format (see
+# ScoreJournal), so a setting may appear more than once, the last one
+# winning, and a scoreboard's scores may be split across several SCO lines.
+# A compacted file starts with the size of the rest of it, so we can tell
+# how much has been appended since:
+# SIZ=1234
+
+# Matches every scoreboard line.
+SCOREBOARD_PATTERN = re.compile(rb'^SCO=([^\r\n]*)', re.M)
 
 class DataLoader(object):
     """
     Load scores and other stored data from our config file.
     """
 
-    def __init__(self):
+    def __init__(self, path=None, retain=8, history=None, debounce=1.0):
         """
-        Initialize a new score loader object.
+        Initialize a new score loader object, reading from the data file at
+        path, or from the user's data directory by default. Each scoreboard
+        keeps its top retain scores.
+        If history (a ScoreHistory) is given, scores are kept there instead
+        of in the data file, and the data file's scores are imported into it
+        the first time.
+        Changes are saved in the background, debounce seconds after the
+        first unsaved one (see DataWriter).
         """
+        # pylint: disable=R0902
+        self.retain = retain
+        self.history = history
         self.settings = Settings()
         self.soundplayer = SoundPlayer()
+        # The scoreboards parsed so far.
         self.scoreboards = OrderedDict()
         self.fontloader = FontLoader()
 
-        appname = "Omission"
-        appauthor = "MousePaw Media"
-        self.directory = user_data_dir(appname, appauthor)
-        self.path = os.path.join(self.directory, "scores.data")
-        self._data = None
-
+        if path is None:
+            appname = "Omission"
+            appauthor = "MousePaw Media"
+            path = os.path.join(user_data_dir(appname, appauthor),
+                                "scores.data")
+        self.directory = os.path.dirname(path)
+        self.path = path
+        self.journal = ScoreJournal(path)
+        self.writer = DataWriter(self.write_out, debounce)
+        # Guards the scoreboards and pending scores, which the writer thread
+        # also uses.
+        self._lock = threading.RLock()
+        # The scores added but not yet written, as (datastring, score, name).
+        self._pending = []
+
+        # The raw file data, which scoreboards are parsed from on demand,
+        # and the datastrings we know aren't in it.
+        self._raw = b''
+        self._missing = set()
         try:
-            with open(self.path) as scorefile:
-                rawdata = scorefile.read()
-            self._data = re.split(r'\n', rawdata)
+            with open(self.path, 'rb') as scorefile:
+                self._raw = scorefile.read()
         except FileNotFoundError:
             # The file doesn't yet exist, that's fine. Carry on.
             pass
+        self.parse(self._raw)
+        # The settings as last saved, so we only append them when changed.
+        self._saved_settings = self.get_settings_datastring()
+
+        if self.history is not None and not self.history.is_imported(self.path):
+            self.history.import_datafile(self.path)
+
+    def parse(self, data, settings=True):
+        """
+        Parse our settings out of our raw file data. Only the settings lines
+        are looked at; each scoreboard is found and parsed the first time
+        it is needed (see _scoreboard()), so in a compacted file this costs
+        the same no matter how many scoreboards there are.
+        If settings is False, our own settings are kept instead.
+        """
+        self._raw = data
+        self._missing = set()
+
+        # Work out how much has been appended since the file was compacted.
+        # A file without a size has never been compacted by us, so all of it
+        # counts as appended, and it is compacted once it has grown enough.
+        self.journal.appended = len(data)
+        regions = [(0, len(data))]
+        for start, end in self._find_lines(b'SIZ=', 0, len(b'SIZ=')):
+            if data[start:end].isdigit():
+                compacted = min(end + 1 + int(data[start:end]), len(data))
+                self.journal.appended = len(data) - compacted
+                # In a compacted file, the settings come before the first
+                # scoreboard, so only that and anything appended since need
+                # to be searched.
+                first = data.find(b'\nSCO=', 0, compacted)
+                if first != -1:
+                    regions = [(0, first), (compacted, len(data))]
+
+        if not settings:
+            return
+        # Each kind of settings line is applied in order, the last winning.
+        for begin, stop in regions:
+            for start, end in self._find_lines(b'DEF=', begin, stop):
+                try:
+                    self.parse_settings(data[start:end].decode('utf-8'))
+                except (IndexError, ValueError, UnicodeDecodeError):
+                    pass
+            for start, end in self._find_lines(b'VOL=', begin, stop):
+                if data[start:end].isdigit():
+                    self.soundplayer.set_volume(int(data[start:end]))
+            for start, end in self._find_lines(b'DYS=', begin, stop):
+                if data[start:end].isdigit():
+                    self.fontloader.set_dyslexic_mode(bool(int(data[start:end])))
+
+    def _find_lines(self, prefix, begin=0, stop=None, data=None):
+        """
+        Yield the (start, end) offsets of the rest of every line in data (by
+        default, the raw file data) that starts with prefix, in order. Only
+        lines starting from begin (which must be the start of a line) up to
+        stop are found.
+        """
+        if data is None:
+            data = self._raw
+        if stop is None:
+            stop = len(data)
+        needle = b'\n' + prefix
+        if data.startswith(prefix, begin, stop):
+            start = begin + len(prefix)
+        else:
+            start = data.find(needle, begin, stop)
+            if start != -1:
+                start += len(needle)
+        while start != -1:
+            end = data.find(b'\n', start)
+            if end == -1:
+                end = len(data)
+            yield (start, end - 1 if data[end - 1:end] == b'\r' else end)
+            start = data.find(needle, end, stop)
+            if start != -1:
+                start += len(needle)
+
+    @staticmethod
+    def _read_scores(scoreboard, data, offset):
+        """
+        Add the scores starting at offset in the raw file data to the
+        scoreboard, up to the next line that isn't a score.
+        """
+        while data[offset:offset + 1] == b':':
+            end = data.find(b'\n', offset)
+            if end == -1:
+                end = len(data)
+            tokens = data[offset + 1:end].decode('utf-8', 'replace') \
+                .rstrip("\r").split(":")
+            try:
+                scoreboard.add_score(int(tokens[0]), tokens[1])
+            except (IndexError, ValueError):
+                pass
+            offset = end + 1
+
+    def _read_scoreboards(self, data, scoreboards, skip=()):
+        """
+        Add the scores of every scoreboard in the raw file data to the
+        scoreboards dictionary, except those with datastrings in skip.
+        """
+        for match in SCOREBOARD_PATTERN.finditer(data):
+            setting_datastring = match.group(1).decode('utf-8', 'replace')
+            if setting_datastring in skip:
+                continue
+            scoreboard = scoreboards.get(setting_datastring)
+            if scoreboard is None:
+                scoreboard = Scoreboard(setting_datastring, self.retain)
+                scoreboards[setting_datastring] = scoreboard
+            self._read_scores(scoreboard, data,
+                              data.find(b'\n', match.end()) + 1 or len(data))
+
+    def _scoreboard(self, setting_datastring):
+        """
+        Return the scoreboard for the given datastring, finding and parsing
+        it in the raw file data the first time, or None if we have no scores
+        for it.
+        """
+        scoreboard = self.scoreboards.get(setting_datastring)
+        if scoreboard is not None or setting_datastring in self._missing:
+            return scoreboard
+
+        # The scoreboard's scores may be split across several SCO lines.
+        prefix = b'SCO=' + str(setting_datastring).encode('utf-8')
+        for start, end in self._find_lines(prefix):
+            # Skip longer datastrings that start with ours.
+            if start != end:
+                continue
+            if scoreboard is None:
+                scoreboard = Scoreboard(setting_datastring, self.retain)
+            self._read_scores(scoreboard, self._raw,
+                              self._raw.find(b'\n', end) + 1 or len(self._raw))
+
+        if scoreboard is None:
+            self._missing.add(setting_datastring)
+        else:
+            self.scoreboards[setting_datastring] = scoreboard
+        return scoreboard
+
+    def load_scoreboards(self):
+        """
+        Parse every scoreboard that hasn't been parsed yet.
+        """
+        with self._lock:
+            # The scoreboards parsed before now already hold all their scores.
+            self._read_scoreboards(self._raw, self.scoreboards,
+                                   set(self.scoreboards))
+            # Everything is parsed, so we don't need the raw data anymore.
+            self._raw = b''
+            self._missing = set()
+
+    def parse_settings(self, datastring):
+        """
+        Load the default settings for a mode from its datastring.
+        """
+        # T:time:bonus:penalty:tries:hint:clue:chain:solution
+        if datastring[:1] == "T":
+            self.settings.timed.set_datastring(datastring)
+        # S:lives:tries:hint:clue:chain:solution
+        elif datastring[:1] == "S":
+            self.settings.survival.set_datastring(datastring)
+        # I:tries:hint:clue:chain:solution
+        elif datastring[:1] == "I":
+            self.settings.infinite.set_datastring(datastring)
+
+    def get_settings_datastring(self):
+        """
+        Get the settings, volume and display mode as written to our file.
+        """
+        return self.settings.get_datastring() + \
+            self.soundplayer.get_datastring() + \
+            self.fontloader.get_datastring()
+
+    def _file_settings_datastring(self, data):
+        """
+        Get the settings, volume and display mode last written to the raw
+        file data, as get_settings_datastring() does. Anything missing from
+        the data (or not valid there) comes from our own settings.
+        """
+        # Each line, by the part of it naming which setting it is.
+        lines = OrderedDict()
+        for line in self.get_settings_datastring().splitlines():
+            lines[line[:5] if line[:4] == "DEF=" else line[:4]] = line
+
+        for start, end in self._find_lines(b'DEF=', data=data):
+            try:
+                line = data[start:end].decode('utf-8')
+                # Only keep settings we could load.
+                GameRoundSettings().set_datastring(line)
+            except (IndexError, ValueError, UnicodeDecodeError):
+                continue
+            if "DEF=" + line[:1] in lines:
+                lines["DEF=" + line[:1]] = "DEF=" + line
+        for prefix in ("VOL=", "DYS="):
+            for start, end in self._find_lines(prefix.encode('utf-8'),
+                                               data=data):
+                if data[start:end].isdigit():
+                    lines[prefix] = prefix + data[start:end].decode('utf-8')
+        return "".join(line + "\n" for line in lines.values())
+
+    def _compacted(self, data):
+        """
+        Get the compacted contents of our file, from the raw data now in it.
+        Every instance appends its scores and settings as it gets them, so
+        the file, not our own memory, is where all of them are.
+        """
+        scoreboards = OrderedDict()
+        self._read_scoreboards(data, scoreboards)
+        # Any settings we changed were appended before compacting, so the
+        # last ones in the file are the right ones, whoever saved them.
+        output = self._file_settings_datastring(data)
+        for scoreboard in scoreboards.values():
+            # Skip empty scoreboards, such as one left by a partial write.
+            if scoreboard.get_scores():
+                output += scoreboard.get_datastring()
+        return output
 
-        self.parse_settings()
-        self.parse_scores()
-
-    def parse_settings(self):
-        """
-        Parse our settings out of our file data.
-        """
-        if self._data:
-            for line in self._data:
-                # If we found a settings line...
-                if re.match(r'DEF=.*', line):
-                    tokens = re.split(r':', line)
-                    # DEF=T:time:bonus:penalty:tries:hint:clue:chain:solution
-                    if tokens[0] == "DEF=T":
-                        self.settings.timed.set_timed(int(tokens[1]),
-                                                      int(tokens[2]),
-                                                      int(tokens[3]),
-                                                      int(tokens[4]))
-                        self.settings.timed.set_clues(int(tokens[5]),
-                                                      int(tokens[6]))
-                        self.settings.timed.set_chain(int(tokens[7]))
-                        self.settings.timed.set_solution_pause(bool(int(tokens[8])))
-                    # DEF=S:lives:tries:hint:clue:chain:solution
-                    elif tokens[0] == "DEF=S":
-                        self.settings.survival.set_survival(int(tokens[1]),
-                                                            int(tokens[2]))
-                        self.settings.survival.set_clues(int(tokens[3]),
-                                                         int(tokens[4]))
-                        self.settings.timed.set_chain(int(tokens[5]))
-                        self.settings.survival.set_solution_pause(bool(int(tokens[6])))
-                    # DEF=I:tries:hint:clue:chain:solution
-                    elif tokens[0] == "DEF=I":
-                        self.settings.infinite.set_infinite(int(tokens[1]))
-                        self.settings.infinite.set_clues(int(tokens[2]),
-                                                         int(tokens[3]))
-                        self.settings.timed.set_chain(int(tokens[4]))
-                        self.settings.infinite.set_solution_pause(bool(int(tokens[5])))
-                elif re.match(r'VOL=.*', line):
-                    tokens = re.split(r'=', line)
-                    self.soundplayer.set_volume(int(tokens[1]))
-                elif re.match(r'DYS=.*', line):
-                    tokens = re.split(r'=', line)
-                    self.fontloader.set_dyslexic_mode(bool(int(tokens[1])))
-
-    def parse_scores(self):
-        """
-        Parse scores out of our file data.
-        """
-        # Temporary datastring storage.
-        datastring = ""
-
-        if self._data:
-            for line in self._data:
-                # If we found a settings line...
-                if re.match(r'SCO=.*', line):
-                    # Store the datastring.
-                    datastring = line[4:]
-                    self.scoreboards[datastring] = Scoreboard(datastring)
-                # Else if we found a score line...
-                elif re.match(r'^:.*$', line) and datastring != "":
-                    tokens = re.split(r':', line[1:])
-                    try:
-                        self.scoreboards[datastring].add_score(int(tokens[0]),
-                                                               tokens[1])
-                    except KeyError:
-                        pass
-                # If we find anything else, ignore the line.
-
-    def write_out(self):
-        """
-        Write out the new file.
-        """
-        # Create the folders, if necessary.
-        os.makedirs(self.directory, 0o777, True)
-
-        # Generate the output for the file.
-        output = ""
-        output += self.settings.get_datastring()
-        output += self.soundplayer.get_datastring()
-        output += self.fontloader.get_datastring()
-        #pylint: disable=W0612
-        for datastr, scoreboard in self.scoreboards.items():
-            output += scoreboard.get_datastring()
-
-        # Write out the output.
-        with open(self.path, 'w') as scorefile:
-            # Write out
-            print(output, file=scorefile)
+    def mark_dirty(self):
+        """
+        Note that the settings have changed, so they get saved.
+        """
+        self.writer.notify()
+
+    def flush(self):
+        """
+        Save everything now, waiting for it to finish. Call this on exit.
+        """
+        self.writer.flush(True)
+
+    def write_out(self, compact=False):
+        """
+        Save everything to our file: append the pending scores, and the
+        settings if they changed since last saved, and sync the journal,
+        then compact the file if it has grown enough, or if compact is True.
+        This is normally called on the writer thread (see mark_dirty() and
+        flush()).
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = []
+        output = "".join("SCO=" + str(setting_datastring) + "\n:" +
+                         str(score) + ":" + str(name) + "\n"
+                         for setting_datastring, score, name in pending)
+        datastring = self.get_settings_datastring()
+        if datastring != self._saved_settings:
+            # Only the lines we changed, so we don't undo settings another
+            # instance saved meanwhile.
+            saved = set(self._saved_settings.splitlines())
+            output += "".join(line + "\n" for line in datastring.splitlines()
+                              if line not in saved)
+        # Everything goes in one record, so one write.
+        if output:
+            try:
+                self.journal.append(output)
+            except BaseException:
+                # Keep the scores for the next write to try again.
+                with self._lock:
+                    self._pending[:0] = pending
+                raise
+        self._saved_settings = datastring
+
+        if compact or self.journal.needs_compaction():
+            data = self.journal.compact(self._compacted)
+            if data is not None:
+                with self._lock:
+                    # Start again from the new file, which has the scores
+                    # every instance has saved, and then the scores added
+                    # since we began.
+                    self.scoreboards = OrderedDict()
+                    self.parse(data, False)
+                    for setting_datastring, score, name in self._pending:
+                        self._add_to_scoreboard(setting_datastring, score, name)
+        else:
+            self.journal.sync()
 
     def get_scores(self, setting_datastring):
         """
         Get the scores from the scoreboard for the given datastring.
         """
-        try:
-            scoreboard = self.scoreboards[setting_datastring]
+        if self.history is not None:
+            return self.history.top(setting_datastring, self.retain) or None
+        with self._lock:
+            scoreboard = self._scoreboard(setting_datastring)
+            if scoreboard is None:
+                return None
             return scoreboard.get_scores()
-        except KeyError:
-            return None
 
     def check_score(self, setting_datastring, score):
         """
@@ -160,90 +384,93 @@ class DataLoader(object):
         # Scores less than 1 are never worth logging.
         if score < 1:
             return False
-        try:
-            scoreboard = self.scoreboards[setting_datastring]
+        if self.history is not None:
+            return self.history.check(setting_datastring, score, self.retain)
+        with self._lock:
+            scoreboard = self._scoreboard(setting_datastring)
+            if scoreboard is None:
+                # We have no scores for that datastring,
+                # and thus the score is DEFINITELY worth logging.
+                return True
             return scoreboard.check_score(score)
-        except KeyError:
-            # We have no scores for that datastring,
-            # and thus the score is DEFINITELY worth logging.
-            return True
+
+    def _add_to_scoreboard(self, setting_datastring, score, name):
+        """
+        Add a score to the scoreboard in memory, creating it if need be.
+        """
+        scoreboard = self._scoreboard(setting_datastring)
+        if scoreboard is None:
+            # We need to create a new scoreboard.
+            scoreboard = Scoreboard(setting_datastring, self.retain)
+            self.scoreboards[setting_datastring] = scoreboard
+        scoreboard.add_score(score, name)
 
     def add_score(self, setting_datastring, score, name):
         """
-        Add a new score to the scoreboard.
+        Add a new score to the scoreboard. It is saved in the background.
         """
-        try:
-            scoreboard = self.scoreboards[setting_datastring]
-            # Add our score to it.
-            scoreboard.add_score(score, name)
-        except KeyError:
-            # We need to create a new scoreboard and add our score to it.
-            self.scoreboards[setting_datastring] = Scoreboard(setting_datastring)
-            self.scoreboards[setting_datastring].add_score(score, name)
+        if self.history is not None:
+            self.history.add(setting_datastring, score, name)
+            return
+        with self._lock:
+            self._add_to_scoreboard(setting_datastring, score, name)
+            self._pending.append((setting_datastring, score, name))
+        self.writer.notify()
 
 class Scoreboard(object):
     """
     Contains the scores for a single settings combination.
+    Players with the same score are all kept, ranked in the order they got
+    it.
     """
 
-    def __init__(self, setting_datastring):
+    def __init__(self, setting_datastring, retain=8):
+        """
+        Create a new Scoreboard, keeping the top retain scores.
+        """
         self.setting_datastring = setting_datastring
-        self.scoreboard = OrderedDict()
-        self.full = False
+        # The scores as a min-heap of (score, -sequence, name) entries, so
+        # the lowest score, and the latest of any tied for lowest, is always
+        # first in line to drop off the board.
+        self.scoreboard = []
+        # Counts the scores we've been given, to order ties.
+        self._sequence = itertools.count()
+        # The scores, best first, made on demand.
+        self._ranked = None
         # This determines how many scores we keep.
-        self.retain = 8
+        self.retain = retain
 
     def add_score(self, score, name):
         """
         Add a new score.
         """
-        self.scoreboard[score] = name
-        self.sort_scores()
+        entry = (score, -next(self._sequence), name)
+        # Keep only the top 'n' scores.
+        if len(self.scoreboard) < self.retain:
+            heapq.heappush(self.scoreboard, entry)
+        else:
+            heapq.heappushpop(self.scoreboard, entry)
+        self._ranked = None
 
     def check_score(self, new_score):
         """
         Check if the score is worth logging.
         """
-        # If any scores are logged...
-        if len(self.scoreboard) >= self.retain:
-            for score in self.scoreboard:
-                # As soon as we find a score the new one is greater than...
-                if new_score > score:
-                    # Return True
-                    return True
-            return False
-        # If no scores are logged...
-        else:
+        # Until the scoreboard is full, any score makes it. After that, the
+        # score has to beat the lowest one.
+        if len(self.scoreboard) < self.retain:
             return True
-
-    def sort_scores(self):
-        """
-        Sort the scores and only retain the top 10.
-        """
-        # Sort (descending)
-        self.scoreboard = OrderedDict(reversed(sorted(self.scoreboard.items())))
-        # Keep only the top 'n' items:
-        # Counts how many elements we've seen.
-        i = 0
-        # For each item...
-        for item in self.scoreboard:
-            # If we have more than the max...
-            if i >= self.retain:
-                # Remove the item.
-                del self.scoreboard[item]
-            i += 1
+        return new_score > self.scoreboard[0][0]
 
     def get_scores(self):
         """
-        Get the scores from this scoreboard.
+        Get the scores from this scoreboard, best first, as a list of
+        (score, name) tuples.
         """
-        # We'll return as a list of tuples.
-        scores = []
-        # Iterate through the OrderedDict...
-        for score, name in self.scoreboard.items():
-            # Append a tuple for each pair to our return list.
-            scores.append((score, name))
-        return scores
+        if self._ranked is None:
+            self._ranked = [(score, name) for score, _, name
+                            in sorted(self.scoreboard, reverse=True)]
+        return list(self._ranked)
 
     def get_datastring(self):
         """
@@ -251,7 +478,7 @@ class Scoreboard(object):
         our settings file.
         """
         output = "SCO=" + str(self.setting_datastring) + "\n"
-        for score, name in self.scoreboard.items():
+        for score, name in self.get_scores():
             output += ":" + str(score) + ":" + str(name) + "\n"
         return output
 
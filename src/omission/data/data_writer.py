@@ -0,0 +1,132 @@
+"""
+Background Data Writer [Omission]
+"""
+
+import threading
+import time
+import traceback
+
+class DataWriter(object):
+    """
+    Saves data in the background, so the UI thread never waits on the disk.
+    Changes are announced with notify(), and every notification within the
+    debounce window is coalesced into one write. The thread is only alive
+    while a write is pending.
+    """
+    # pylint: disable=R0902
+
+    def __init__(self, write, debounce=1.0):
+        """
+        Create a new DataWriter. write is called (on the writer thread) to
+        save everything, at most debounce seconds after the first change
+        it has not yet saved.
+        """
+        self._write = write
+        self.debounce = debounce
+        # Guards the state below and wakes the writer and flush().
+        self._condition = threading.Condition()
+        # Whether a write is pending, and when it is due.
+        self._dirty = False
+        self._deadline = None
+        # Whether a write is in progress.
+        self._writing = False
+        # The writer thread, if it is running.
+        self._thread = None
+
+        # The writes performed, and the notifications folded into a write
+        # that was already pending.
+        self.writes = 0
+        self.coalesced = 0
+
+    def notify(self):
+        """
+        Note that there are changes to save.
+        """
+        with self._condition:
+            if self._dirty:
+                self.coalesced += 1
+                return
+            self._schedule()
+
+    def _schedule(self):
+        """
+        Make a write due in debounce seconds, starting the writer thread
+        if it isn't running. The lock must be held.
+        """
+        self._dirty = True
+        # The window starts at the first change, so a stream of changes
+        # can't hold the write off forever.
+        self._deadline = time.monotonic() + self.debounce
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        else:
+            self._condition.notify_all()
+
+    def _run(self):
+        """
+        The writer loop, which writes once each pending write falls due.
+        """
+        while True:
+            with self._condition:
+                while True:
+                    # Let a flush() in progress finish first.
+                    if self._writing:
+                        self._condition.wait()
+                        continue
+                    # If nothing is left to do, the thread exits.
+                    if not self._dirty:
+                        self._thread = None
+                        return
+                    wait = self._deadline - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._condition.wait(wait)
+            self._perform()
+
+    def _perform(self, force=False):
+        """
+        Claim the pending write and perform it, unless another thread
+        already has (or, if force is True, regardless).
+        """
+        with self._condition:
+            while self._writing:
+                self._condition.wait()
+            if not (self._dirty or force):
+                return
+            self._writing = True
+            self._dirty = False
+        failed = False
+        try:
+            self._write()
+        except Exception: # pylint: disable=W0703
+            # Keep the writer alive; the next write may well succeed.
+            traceback.print_exc()
+            failed = True
+        finally:
+            with self._condition:
+                self._writing = False
+                if not failed:
+                    self.writes += 1
+                # Try again after another window, unless a change already
+                # made a write due.
+                if failed and not self._dirty:
+                    self._schedule()
+                self._condition.notify_all()
+
+    def flush(self, force=False):
+        """
+        Perform any pending write now, on the caller's thread, waiting for
+        a write in progress to finish first. If force is True, write even
+        if nothing is pending. Call this before exiting.
+        """
+        self._perform(force)
+
+    def get_stats(self):
+        """
+        Returns the writer statistics as (writes, coalesced), where
+        coalesced is the number of notifications saved by a write that
+        was already pending.
+        """
+        with self._condition:
+            return (self.writes, self.coalesced)
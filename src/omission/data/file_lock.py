@@ -0,0 +1,84 @@
+"""
+File Lock [Omission]
+"""
+
+import os
+import threading
+import time
+
+# Advisory locking is done with flock on POSIX and msvcrt on Windows.
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+class FileLock(object):
+    """
+    An exclusive advisory lock shared between processes, held on a lock
+    file of its own so the file it guards can be replaced while locked.
+    It also excludes other threads of the same process.
+    """
+
+    def __init__(self, path):
+        """
+        Create a new FileLock on the lock file at path, which is created
+        if necessary.
+        """
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._file = None
+        self._acquired = 0
+        # The longest the lock has been held, in seconds.
+        self.longest = 0
+
+    def acquire(self):
+        """
+        Wait for and take the lock.
+        """
+        self._thread_lock.acquire()
+        try:
+            os.makedirs(os.path.dirname(self.path), 0o777, True)
+            self._file = open(self.path, 'a+b')
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            else:
+                # msvcrt locks a byte range, and gives up after ten tries
+                # a second apart, so keep trying.
+                self._file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+        except BaseException:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._thread_lock.release()
+            raise
+        self._acquired = time.perf_counter()
+
+    def release(self):
+        """
+        Release the lock.
+        """
+        self.longest = max(self.longest, time.perf_counter() - self._acquired)
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+            self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
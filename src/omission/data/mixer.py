@@ -0,0 +1,192 @@
+"""
+Sound Effect Mixer [Omission]
+"""
+
+import threading
+import time
+
+# What a voice pool does when it is triggered with every voice playing:
+# stop the voice that started first and reuse it, or drop the new trigger.
+STEAL_OLDEST = 'oldest'
+STEAL_NONE = 'none'
+
+class VoicePool(object):
+    """
+    A set of voices (copies of one loaded sound), so an effect can be
+    triggered again while it is still playing without cutting itself off.
+    The pool can start small and grow, up to a limit, once the effect
+    actually overlaps itself.
+    """
+    # pylint: disable=R0902
+
+    def __init__(self, voices, steal=STEAL_OLDEST, volume=1, limit=None,
+                 grow=None):
+        """
+        Create a new VoicePool of the given voices (Kivy Sounds; any that
+        failed to load, being None, are left out), with the given voice
+        stealing rule and volume (0-1).
+        If there are fewer than limit voices, grow is called (once at a
+        time) when every voice is busy, and should arrange for another to
+        be passed to add_voice(). Meanwhile, the stealing rule applies.
+        """
+        # pylint: disable=R0913
+        self._voices = []
+        # When each voice was last started, on the monotonic clock.
+        self._started = []
+        self.steal = steal
+        self._volume = volume
+        self.limit = limit
+        self._grow = grow
+        # Whether we are waiting on grow for another voice.
+        self._growing = False
+        for voice in voices:
+            self.add_voice(voice)
+        self._growing = False
+
+        # The triggers played, those that stole a voice, and those dropped.
+        self.triggers = 0
+        self.steals = 0
+        self.drops = 0
+
+    def __len__(self):
+        """
+        Return the number of voices.
+        """
+        return len(self._voices)
+
+    def add_voice(self, voice):
+        """
+        Add a voice (a Kivy Sound) to the pool. If it failed to load (and
+        so is None), the pool stops growing.
+        """
+        if not voice:
+            return
+        voice.volume = self._volume
+        # The start time goes first, as trigger() may be running.
+        self._started.append(0)
+        self._voices.append(voice)
+        self._growing = False
+
+    def set_volume(self, volume):
+        """
+        Set the volume (0-1) of every voice.
+        """
+        self._volume = volume
+        for voice in self._voices:
+            voice.volume = volume
+
+    def trigger(self):
+        """
+        Play the sound on a free voice, stealing one if the rule allows.
+        Returns True if the sound was played, else False.
+        """
+        if not self._voices:
+            return False
+        now = time.monotonic()
+
+        index = None
+        for i, voice in enumerate(self._voices):
+            if voice.state != 'play':
+                index = i
+                break
+        if index is None:
+            # Ask for another voice for next time.
+            if self._grow is not None and not self._growing and \
+               len(self._voices) < (self.limit or 0):
+                self._growing = True
+                self._grow()
+            if self.steal != STEAL_OLDEST:
+                self.drops += 1
+                return False
+            index = self._started.index(min(self._started))
+            self._voices[index].stop()
+            self.steals += 1
+
+        self._started[index] = now
+        self._voices[index].play()
+        self.triggers += 1
+        return True
+
+class Mixer(object):
+    """
+    Plays sound effects from a voice pool for each, at one shared volume.
+    The volume is only applied to the voices when it changes, and the time
+    each trigger takes is measured per effect.
+    """
+
+    def __init__(self, volume=1):
+        """
+        Create a new Mixer with the given volume (0-1).
+        """
+        self._pools = {}
+        self._volume = volume
+        # The trigger latencies of each effect, as [count, total, worst],
+        # in seconds.
+        self._latency = {}
+        # Guards the pools and volume, which are changed from other threads.
+        self._lock = threading.Lock()
+
+    def add_pool(self, name, voices, steal=STEAL_OLDEST, limit=None,
+                 grow=None):
+        """
+        Add (or replace) the named effect, playing on the given voices with
+        the given voice stealing rule, and growing up to limit voices with
+        grow (see VoicePool).
+        """
+        # pylint: disable=R0913
+        with self._lock:
+            self._pools[name] = VoicePool(voices, steal, self._volume, limit,
+                                          grow)
+
+    def add_voice(self, name, voice):
+        """
+        Add a voice to the named effect's pool, if it has one.
+        """
+        with self._lock:
+            pool = self._pools.get(name)
+            if pool is not None:
+                pool.add_voice(voice)
+
+    def get_pool(self, name):
+        """
+        Return the named effect's VoicePool, or None if there isn't one.
+        """
+        return self._pools.get(name)
+
+    def set_volume(self, volume):
+        """
+        Set the volume (0-1) of every effect.
+        """
+        with self._lock:
+            if volume == self._volume:
+                return
+            self._volume = volume
+            for pool in self._pools.values():
+                pool.set_volume(volume)
+
+    def trigger(self, name):
+        """
+        Play the named effect. Returns True if it was played, else False.
+        """
+        started = time.perf_counter()
+        pool = self._pools.get(name)
+        if pool is None:
+            return False
+        played = pool.trigger()
+
+        elapsed = time.perf_counter() - started
+        latency = self._latency.setdefault(name, [0, 0, 0])
+        latency[0] += 1
+        latency[1] += elapsed
+        latency[2] = max(latency[2], elapsed)
+        return played
+
+    def get_latency(self, name):
+        """
+        Returns the trigger latency of the named effect as (triggers, mean
+        seconds, worst seconds), or None if it hasn't been triggered.
+        """
+        latency = self._latency.get(name)
+        if latency is None:
+            return None
+        return (latency[0], latency[1] / latency[0], latency[2])
@@ -0,0 +1,255 @@
+"""
+Score History [Omission]
+"""
+
+import argparse
+import os.path
+import sqlite3
+import threading
+import time
+
+from appdirs import user_data_dir
+
+# Every score ever set, not just the top of each scoreboard. The index on
+# (settings, score, id) lets the top scores for a settings datastring, and
+# the score at any rank, be read straight off the index, however many rows
+# there are.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    settings TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_by_rank ON scores (settings, score DESC, id);
+CREATE INDEX IF NOT EXISTS scores_by_time ON scores (created);
+CREATE INDEX IF NOT EXISTS scores_by_name ON scores (name, created);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def default_history_path():
+    """
+    Return the path of the score history in the user's data directory.
+    """
+    return os.path.join(user_data_dir("Omission", "MousePaw Media"),
+                        "history.db")
+
+class ScoreHistory(object):
+    """
+    Keeps the full history of scores in an SQLite database, for reporting.
+    DataLoader can use it in place of its scoreboards, in which case each
+    scoreboard is the top of the history for its settings datastring.
+    """
+
+    def __init__(self, path=None):
+        """
+        Open (or create) the score history at path, or in the user's data
+        directory by default. Use ':memory:' for a throwaway history.
+        """
+        if path is None:
+            path = default_history_path()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), 0o777, True)
+        self.path = path
+        # The connection may be used from more than one thread, one at a time.
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # Write-ahead logging keeps inserts cheap and lets other instances
+        # read while we write.
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._lock, self._db:
+            self._db.executescript(SCHEMA)
+
+    def add(self, settings, score, name, created=None):
+        """
+        Record a score for the given settings datastring, set at the time
+        created (seconds since the epoch), or now.
+        """
+        if created is None:
+            created = time.time()
+        with self._lock, self._db:
+            self._db.execute("INSERT INTO scores (settings, score, name, created)"
+                             " VALUES (?, ?, ?, ?)",
+                             (settings, score, name, created))
+
+    def top(self, settings, count=8):
+        """
+        Return the top count scores for the settings datastring, best first,
+        as a list of (score, name) tuples. Ties are ranked in the order they
+        were set.
+        """
+        with self._lock:
+            return self._db.execute(
+                "SELECT score, name FROM scores WHERE settings = ?"
+                " ORDER BY score DESC, id LIMIT ?", (settings, count)).fetchall()
+
+    def check(self, settings, score, retain=8):
+        """
+        Check if a score would make the top retain scores for the settings
+        datastring.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT score FROM scores WHERE settings = ?"
+                " ORDER BY score DESC, id LIMIT 1 OFFSET ?",
+                (settings, retain - 1)).fetchone()
+        # Until there are retain scores, any score makes it.
+        return row is None or score > row[0]
+
+    def count(self, settings=None):
+        """
+        Return the number of scores recorded, for the settings datastring
+        if given.
+        """
+        with self._lock:
+            if settings is None:
+                row = self._db.execute("SELECT COUNT(*) FROM scores").fetchone()
+            else:
+                row = self._db.execute(
+                    "SELECT COUNT(*) FROM scores WHERE settings = ?",
+                    (settings,)).fetchone()
+        return row[0]
+
+    def percentile(self, settings, fraction):
+        """
+        Return the score that the given fraction (0-1) of the scores for
+        the settings datastring fall below, or None if there are none.
+        """
+        total = self.count(settings)
+        if total == 0:
+            return None
+        # Count down from the top, which the index gives us in order.
+        rank = min(int((1 - fraction) * total), total - 1)
+        with self._lock:
+            return self._db.execute(
+                "SELECT score FROM scores WHERE settings = ?"
+                " ORDER BY score DESC, id LIMIT 1 OFFSET ?",
+                (settings, rank)).fetchone()[0]
+
+    def player_trend(self, name, settings=None):
+        """
+        Return a player's scores in the order they were set, as a list of
+        (time, settings, score) tuples, for the settings datastring if given.
+        """
+        with self._lock:
+            if settings is None:
+                return self._db.execute(
+                    "SELECT created, settings, score FROM scores"
+                    " WHERE name = ? ORDER BY created", (name,)).fetchall()
+            return self._db.execute(
+                "SELECT created, settings, score FROM scores"
+                " WHERE name = ? AND settings = ? ORDER BY created",
+                (name, settings)).fetchall()
+
+    def per_day(self, settings=None):
+        """
+        Return the number of scores set each day, as a list of (date,
+        count) tuples, for the settings datastring if given.
+        """
+        query = "SELECT date(created, 'unixepoch', 'localtime') AS day," \
+                " COUNT(*) FROM scores"
+        arguments = ()
+        if settings is not None:
+            query += " WHERE settings = ?"
+            arguments = (settings,)
+        with self._lock:
+            return self._db.execute(query + " GROUP BY day ORDER BY day",
+                                    arguments).fetchall()
+
+    def is_imported(self, datapath):
+        """
+        Check if the data file at datapath has already been imported.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM meta WHERE key = ?",
+                ("imported:" + os.path.abspath(datapath),)).fetchone()
+        return row is not None
+
+    def import_datafile(self, datapath):
+        """
+        Import every score in an existing data file (see DataLoader), dated
+        to the file's last change since the real times weren't kept. The
+        file is only ever imported once. Returns the number of scores
+        imported.
+        """
+        if self.is_imported(datapath):
+            return 0
+        try:
+            created = os.stat(datapath).st_mtime
+            with open(datapath) as datafile:
+                rows = list(_read_scores(datafile, created))
+        except FileNotFoundError:
+            rows = []
+
+        with self._lock, self._db:
+            self._db.executemany("INSERT INTO scores (settings, score, name,"
+                                 " created) VALUES (?, ?, ?, ?)", rows)
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value)"
+                             " VALUES (?, ?)",
+                             ("imported:" + os.path.abspath(datapath),
+                              str(time.time())))
+        return len(rows)
+
+    def close(self):
+        """
+        Close the score history.
+        """
+        with self._lock:
+            self._db.close()
+
+def _read_scores(lines, created):
+    """
+    Yield (settings, score, name, created) for every score in the lines of
+    a data file.
+    """
+    datastring = None
+    for line in lines:
+        line = line.rstrip("\n")
+        if line[:4] == "SCO=":
+            datastring = line[4:]
+        elif line[:1] == ":" and datastring is not None:
+            tokens = line[1:].split(":")
+            try:
+                yield (datastring, int(tokens[0]), tokens[1], created)
+            except (IndexError, ValueError):
+                continue
+
+def main():
+    """
+    Import data files into the score history, and report on it, from the
+    command line.
+    """
+    parser = argparse.ArgumentParser(
+        description="Import and report on the Omission score history.")
+    parser.add_argument('--history', default=None,
+                        help="the score history database (default: user data)")
+    subparsers = parser.add_subparsers(dest='command')
+    importer = subparsers.add_parser('import', help="import data files")
+    importer.add_argument('datafiles', nargs='+')
+    reporter = subparsers.add_parser('report', help="summarize a scoreboard")
+    reporter.add_argument('settings', help="the settings datastring")
+    args = parser.parse_args()
+
+    history = ScoreHistory(args.history)
+    if args.command == 'import':
+        for datapath in args.datafiles:
+            print("Imported {} scores from {}".format(
+                history.import_datafile(datapath), datapath))
+    elif args.command == 'report':
+        print("Scores:  {}".format(history.count(args.settings)))
+        print("Median:  {}".format(history.percentile(args.settings, 0.5)))
+        print("p90:     {}".format(history.percentile(args.settings, 0.9)))
+        for score, name in history.top(args.settings):
+            print("{:>10} | {}".format(score, name))
+    else:
+        parser.print_help()
+    history.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Score Journal [Omission]
+"""
+
+import os
+import os.path
+import tempfile
+
+from omission.data.file_lock import FileLock
+
+class ScoreJournal(object):
+    """
+    Appends changes to our data file as records in its own line format, so
+    saving a score doesn't rewrite the whole file. Since later records win
+    when the file is parsed, the file is always valid as it stands. Once
+    enough records pile up, the file is compacted: rewritten whole, into a
+    temporary file which then replaces it atomically.
+    Several instances of the game may share the data file, so every change
+    to it is made under a FileLock, and compaction carries over whatever the
+    other instances appended while it ran.
+    """
+
+    def __init__(self, path, sync_every=8, compact_threshold=16384):
+        """
+        Create a new ScoreJournal for the data file at path. Appended records
+        are synced to disk after every sync_every records (and on sync()),
+        and the file is due for compaction after compact_threshold bytes
+        have been appended to it.
+        """
+        self.path = path
+        self.sync_every = sync_every
+        self.compact_threshold = compact_threshold
+        # Guards the data file against other instances.
+        self.lock = FileLock(path + ".lock")
+        # The bytes appended since the file was last compacted. The data
+        # loader sets this when it parses the file.
+        self.appended = 0
+        # The records written but not yet synced.
+        self._unsynced = 0
+
+    def append(self, record):
+        """
+        Append a record (one or more complete lines) to the data file.
+        """
+        encoded = record.encode('utf-8')
+        with self.lock:
+            # The file is opened for each record, so we always append to the
+            # current file, even if another instance has replaced it.
+            with open(self.path, 'a+b') as datafile:
+                # Make sure the record won't be joined onto a partial line
+                # left by an interrupted write.
+                if datafile.seek(0, os.SEEK_END) > 0:
+                    datafile.seek(-1, os.SEEK_END)
+                    if datafile.read(1) != b'\n':
+                        encoded = b'\n' + encoded
+                datafile.write(encoded)
+                self._unsynced += 1
+                # Surviving a power cut takes an fsync, so we batch those.
+                if self._unsynced >= self.sync_every:
+                    datafile.flush()
+                    os.fsync(datafile.fileno())
+                    self._unsynced = 0
+        self.appended += len(encoded)
+
+    def sync(self):
+        """
+        Make sure every appended record is on disk.
+        """
+        if self._unsynced:
+            with self.lock:
+                # Syncing any handle to the file syncs all its data.
+                try:
+                    with open(self.path, 'rb') as datafile:
+                        os.fsync(datafile.fileno())
+                except FileNotFoundError:
+                    pass
+            self._unsynced = 0
+
+    def needs_compaction(self):
+        """
+        Return whether enough records have been appended that the file
+        should be compacted.
+        """
+        return self.appended >= self.compact_threshold
+
+    def compact(self, build):
+        """
+        Compact the data file. build is called with the data now in the file
+        (as bytes, up to its last line break) and returns the compacted
+        contents as a string. Returns the new contents of the file, or None
+        if another instance replaced the file in the meantime, in which case
+        nothing is changed.
+        The slow work is done without holding the lock; only checking for
+        and carrying over records appended meanwhile, and the final rename,
+        are done under it.
+        """
+        self.sync()
+        try:
+            with open(self.path, 'rb') as datafile:
+                before = os.fstat(datafile.fileno())
+                data = datafile.read()
+        except FileNotFoundError:
+            before = None
+            data = b''
+        # Only whole lines are compacted; a partial line is carried over.
+        cut = data.rfind(b'\n') + 1
+        output = build(data[:cut]).encode('utf-8')
+        output = b'SIZ=' + str(len(output)).encode('utf-8') + b'\n' + output
+
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, 0o777, True)
+        # Write the new file beside the old one, so the rename is atomic.
+        handle, temppath = tempfile.mkstemp(dir=directory, prefix=".scores-")
+        try:
+            with os.fdopen(handle, 'wb') as newfile:
+                newfile.write(output)
+                newfile.flush()
+                os.fsync(newfile.fileno())
+
+            with self.lock:
+                try:
+                    after = os.stat(self.path)
+                except FileNotFoundError:
+                    after = None
+                # Give up if the file we read was replaced or truncated.
+                if (before is None) != (after is None) or \
+                   (after is not None and
+                        ((after.st_dev, after.st_ino) !=
+                         (before.st_dev, before.st_ino) or
+                         after.st_size < len(data))):
+                    os.remove(temppath)
+                    return None
+                # Carry over anything appended since we read the file.
+                tail = b''
+                if after is not None:
+                    with open(self.path, 'rb') as datafile:
+                        datafile.seek(cut)
+                        tail = datafile.read()
+                if tail:
+                    with open(temppath, 'ab') as newfile:
+                        newfile.write(tail)
+                        newfile.flush()
+                        os.fsync(newfile.fileno())
+                os.replace(temppath, self.path)
+        except BaseException:
+            try:
+                os.remove(temppath)
+            except OSError:
+                pass
+            raise
+        self.appended = len(tail)
+        self._unsynced = 0
+        return output + tail
@@ -2,54 +2,179 @@
 Sound Playback Functions [Omission]
 """
 
+from collections import OrderedDict, deque
 import os.path
+import threading
+import time
 import pkg_resources
 
 from kivy.core.audio import SoundLoader
 
+from omission.data.audio_cache import AudioCache
+from omission.data.mixer import Mixer, STEAL_NONE, STEAL_OLDEST
+
+# The game sounds, by name, as their files in the audio folder, how many
+# voices each may have (how many times it can overlap itself), and what to
+# do when it is played with every voice busy (see VoicePool). Sounds with
+# a decoded copy in the audio cache get all their voices when loaded; the
+# others start with one, and gain the rest as they overlap themselves.
+SOUNDS = OrderedDict(
+    [('alarm', ('alarm.ogg', 2, STEAL_OLDEST)),
+     ('bell', ('bell.ogg', 3, STEAL_OLDEST)),
+     ('lowbell', ('lowbell.ogg', 3, STEAL_OLDEST)),
+     ('ding', ('ding.ogg', 3, STEAL_OLDEST)),
+     ('gameover', ('gameover.ogg', 1, STEAL_NONE))] +
+    [('bonus' + str(i), ('bonus' + str(i) + '.ogg', 2, STEAL_OLDEST))
+     for i in range(1, 9)])
+
 class SoundPlayer(object):
     """
     Play game sounds.
+    Sounds are registered by name, and loaded either in the background by
+    preload(), or the first time they are played. A sound is only played
+    once it is ready; until then, playing it does nothing, rather than
+    making the caller wait for it to load. Loaded sounds are played through
+    a Mixer.
     """
-    def __init__(self):
+    # pylint: disable=R0902
+
+    def __init__(self, cache=None):
+        """
+        Create a new SoundPlayer. Sounds are loaded decoded from the given
+        AudioCache, or one in the user's cache directory by default, where
+        possible.
+        """
         soundfolder = os.path.join(os.pardir, "resources", "audio")
 
         self.vol = 1
+        self.mixer = Mixer(self.vol)
+        self.cache = cache if cache is not None else AudioCache()
+
+        # The files of the registered sounds, with their voices and voice
+        # stealing rules.
+        self._paths = OrderedDict()
+        # Whether each sound is ready to play.
+        self._ready = {}
+        # The sounds waiting to be loaded, in order, and the sounds waiting
+        # for another voice.
+        self._wanted = deque()
+        self._extra = deque()
+        # The file each loaded sound was loaded from, for its other voices.
+        self._sources = {}
+        # Guards the above, and the loading thread.
+        self._lock = threading.Lock()
+        # The loading thread, if it is running.
+        self._thread = None
+        # The total seconds spent loading sounds.
+        self.load_time = 0
+
+        for name, (filename, voices, steal) in SOUNDS.items():
+            self.register(name, pkg_resources.resource_filename(
+                __name__,
+                os.path.join(
+                    soundfolder, filename)), voices, steal)
 
-        self.alarm = SoundLoader.load(pkg_resources.resource_filename(
-            __name__,
-            os.path.join(
-                soundfolder, 'alarm.ogg')))
-
-        self.bell = SoundLoader.load(pkg_resources.resource_filename(
-            __name__,
-            os.path.join(
-                soundfolder, 'bell.ogg')))
+    def register(self, name, path, voices=1, steal=STEAL_OLDEST):
+        """
+        Register the sound file at path under name, to be played on the
+        given number of voices with the given voice stealing rule. It isn't
+        loaded yet.
+        """
+        with self._lock:
+            self._paths[name] = (path, voices, steal)
+            self._ready[name] = False
 
-        self.lowbell = SoundLoader.load(pkg_resources.resource_filename(
-            __name__,
-            os.path.join(
-                soundfolder, 'lowbell.ogg')))
+    def is_ready(self, name):
+        """
+        Returns True if the named sound has been loaded, else False.
+        """
+        return self._ready.get(name, False)
 
-        self.ding = SoundLoader.load(pkg_resources.resource_filename(
-            __name__,
-            os.path.join(
-                soundfolder, 'ding.ogg')))
+    def preload(self):
+        """
+        Start loading every sound that isn't ready in the background.
+        """
+        with self._lock:
+            for name in self._paths:
+                if not self._ready[name] and name not in self._wanted:
+                    self._wanted.append(name)
+            self._start()
 
-        self.gameover = SoundLoader.load(pkg_resources.resource_filename(
-            __name__,
-            os.path.join(
-                soundfolder, 'gameover.ogg')))
+    def _start(self):
+        """
+        Start the loading thread, if it isn't running. The lock must be held.
+        """
+        if (self._wanted or self._extra) and self._thread is None:
+            self._thread = threading.Thread(target=self._load, daemon=True)
+            self._thread.start()
 
-        self.bonus = list()
+    def _load(self):
+        """
+        The loading loop, which loads the wanted sounds in order.
+        """
+        while True:
+            with self._lock:
+                # New sounds come before extra voices for loaded ones.
+                if self._wanted:
+                    name = self._wanted.popleft()
+                    extra = False
+                elif self._extra:
+                    name = self._extra.popleft()
+                    extra = True
+                else:
+                    # If nothing is left to do, the thread exits.
+                    self._thread = None
+                    return
+                entry = self._paths[name]
+                source = self._sources.get(name)
+            path, voices, steal = entry
 
-        for i in range(1, 9):
-            soundpath = pkg_resources.resource_filename(
-                __name__,
-                os.path.join(
-                    soundfolder, 'bonus' + str(i) + '.ogg'))
-            sound = SoundLoader.load(soundpath)
-            self.bonus.append(sound)
+            # Load the sound outside of the lock, so playing isn't blocked.
+            # Each file is only decoded once. Loading its decoded copy is
+            # cheap, so if there is one, every voice is loaded from it now;
+            # otherwise, the other voices wait until they're needed.
+            started = time.perf_counter()
+            if extra:
+                sounds = [SoundLoader.load(source)]
+            else:
+                source = self.cache.get(path)
+                sounds = [SoundLoader.load(source)
+                          for _ in range(voices if source != path else 1)]
+            elapsed = time.perf_counter() - started
+
+            with self._lock:
+                self.load_time += elapsed
+                # Skip a sound that was registered again while we loaded.
+                if self._paths.get(name) != entry:
+                    continue
+                if extra:
+                    self.mixer.add_voice(name, sounds[0])
+                else:
+                    self._sources[name] = source
+                    self.mixer.add_pool(name, sounds, steal, voices,
+                                        lambda name=name: self._add_voice(name))
+                    self._ready[name] = True
+
+    def _add_voice(self, name):
+        """
+        Start loading another voice for the named sound.
+        """
+        with self._lock:
+            if name not in self._extra:
+                self._extra.append(name)
+            self._start()
+
+    def _request(self, name):
+        """
+        Start loading the named sound ahead of anything else, if it isn't
+        ready.
+        """
+        with self._lock:
+            if name in self._paths and not self._ready[name]:
+                if name in self._wanted:
+                    self._wanted.remove(name)
+                self._wanted.appendleft(name)
+                self._start()
 
     def get_datastring(self):
         """
@@ -75,38 +200,41 @@ class SoundPlayer(object):
             vol = 10
 
         self.vol = vol/10
+        # The voices only need their volume set when it changes.
+        self.mixer.set_volume(self.vol)
+
+    def _play(self, name):
+        """
+        Plays the named sound, if it is ready.
+        """
+        if self._ready.get(name, False):
+            self.mixer.trigger(name)
+        else:
+            self._request(name)
 
     def play_alarm(self):
         """
         Plays the alarm sound effect.
         """
-        if self.alarm:
-            self.alarm.volume = self.vol
-            self.alarm.play()
+        self._play('alarm')
 
     def play_bell(self):
         """
         Plays the low bell (wrong) sound effect.
         """
-        if self.bell:
-            self.bell.volume = self.vol
-            self.bell.play()
+        self._play('bell')
 
     def play_lowbell(self):
         """
         Plays the low bell (wrong) sound effect.
         """
-        if self.lowbell:
-            self.lowbell.volume = self.vol
-            self.lowbell.play()
+        self._play('lowbell')
 
     def play_ding(self):
         """
         Plays the ding (correct) sound effect.
         """
-        if self.ding:
-            self.ding.volume = self.vol
-            self.ding.play()
+        self._play('ding')
 
     def play_bonus(self, level):
         """
@@ -114,18 +242,14 @@ class SoundPlayer(object):
         """
         if level > 0:
             if level <= 8:
-                soundlev = level - 1
+                soundlev = level
             else:
-                soundlev = 7
+                soundlev = 8
 
-            if self.bonus[soundlev]:
-                self.bonus[soundlev].volume = self.vol
-                self.bonus[soundlev].play()
+            self._play('bonus' + str(soundlev))
 
     def play_gameover(self):
         """
         Plays the gameover sound effect.
         """
-        self.gameover.volume = self.vol
-        if self.gameover:
-            self.gameover.play()
+        self._play('gameover')
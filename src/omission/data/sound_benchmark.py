@@ -0,0 +1,81 @@
+"""
+Sound Loading Benchmark [Omission]
+"""
+
+import argparse
+import tempfile
+import time
+
+from kivy.core.audio import SoundLoader
+
+from omission.data import audio_cache
+from omission.data.audio_cache import AudioCache
+from omission.data.sound import SoundPlayer
+
+def kivy_load(paths):
+    """
+    Load every sound file with Kivy, as SoundPlayer does.
+    """
+    for path in paths:
+        SoundLoader.load(path)
+
+def decode(paths):
+    """
+    Decode every sound file to 16-bit samples, without Kivy (or an audio
+    device). Requires SoundFile.
+    """
+    for path in paths:
+        audio_cache.soundfile.read(path, dtype='int16')
+
+def bench(load, paths, repeat=5):
+    """
+    Return the best seconds of several loads of all the sound files.
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        load(paths)
+        elapsed = time.perf_counter() - started
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def main():
+    """
+    Compare loading the game sounds from their OGG files and from the
+    decoded audio cache, from the command line.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark loading the Omission sounds.")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="loads to take the best of")
+    args = parser.parse_args()
+
+    if audio_cache.soundfile is None:
+        print("The audio cache requires SoundFile.")
+        return
+
+    # The registered sound files, loaded once each.
+    sources = [entry[0] for entry in SoundPlayer()._paths.values()] # pylint: disable=W0212
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = AudioCache(directory)
+        started = time.perf_counter()
+        cached = [cache.get(source) for source in sources]
+        build = time.perf_counter() - started
+        started = time.perf_counter()
+        cached = [cache.get(source) for source in sources]
+        lookup = time.perf_counter() - started
+
+        print("{:>8}  {:>10}  {:>10}  {:>8}".format(
+            "loader", "ogg", "pcm", "speedup"))
+        for name, load in (("kivy", kivy_load), ("decode", decode)):
+            ogg = bench(load, sources, args.repeat)
+            pcm = bench(load, cached, args.repeat)
+            print("{:>8}  {:>9.4f}s  {:>9.4f}s  {:>7.1f}x".format(
+                name, ogg, pcm, ogg / pcm))
+        print("Building the cache took {:.4f}s, and checking it {:.4f}s."
+              .format(build, lookup))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Batch Puzzle Generation [Omission]
+"""
+
+import random
+
+# NumPy is optional; only batch generation needs it.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The number of words in a Mersenne Twister state.
+MT_WORDS = 624
+
+def _to_numpy(rng):
+    """
+    Return a numpy RandomState in the same state as the random stream rng
+    (a random.Random, or the random module itself). Both are Mersenne
+    Twisters, and numpy's random_sample() makes doubles exactly as
+    random.random() does, so the two then give the same numbers.
+    """
+    internal = rng.getstate()[1]
+    state = numpy.random.RandomState()
+    state.set_state(('MT19937',
+                     numpy.array(internal[:MT_WORDS], dtype=numpy.uint32),
+                     internal[MT_WORDS]))
+    return state
+
+def _from_numpy(rng, state):
+    """
+    Move the random stream rng on to where the numpy RandomState is.
+    """
+    version, _, gauss = rng.getstate()
+    _, key, position = state.get_state()[:3]
+    rng.setstate((version, tuple(int(word) for word in key) + (int(position),),
+                  gauss))
+
+class PuzzleBatch(object):
+    """
+    Makes puzzles in bulk. The whole corpus is held as one NumPy array of
+    UTF-8 bytes, and puzzles come back as arrays of (passage index, letter
+    index, removal count) rather than as ContentItems, for simulation and
+    content analysis. Requires NumPy.
+    """
+
+    def __init__(self, passages):
+        """
+        Encode the given passages, in index order, and count the letters
+        a-z in each of them.
+        """
+        if numpy is None:
+            raise RuntimeError("Batch puzzle generation requires NumPy.")
+
+        encoded = [passage.encode('utf-8') for passage in passages]
+        lengths = numpy.fromiter((len(data) for data in encoded),
+                                 dtype=numpy.int64, count=len(encoded))
+        # The corpus as one array of bytes, and the passage of each byte.
+        text = numpy.frombuffer(b''.join(encoded), dtype=numpy.uint8)
+        owners = numpy.repeat(numpy.arange(len(encoded)), lengths)
+
+        # Fold A-Z onto a-z and keep only the letters, as letter_counts()
+        # does. Every other byte, including all of multibyte UTF-8, falls
+        # outside a-z after folding.
+        letters = (text | 0x20).astype(numpy.int64) - ord('a')
+        keep = (letters >= 0) & (letters < 26)
+        self._counts = numpy.bincount(
+            owners[keep] * 26 + letters[keep],
+            minlength=len(encoded) * 26).reshape(len(encoded), 26)
+        # The running totals of each histogram, for drawing letters.
+        self._cumulative = numpy.cumsum(self._counts, axis=1)
+
+    @classmethod
+    def from_loader(cls, loader):
+        """
+        Encode every passage of a ContentLoader, in the loader's index order.
+        """
+        return cls(loader.get_passage(index)
+                   for index in range(loader.get_count()))
+
+    def __len__(self):
+        """
+        Return the number of passages.
+        """
+        return len(self._counts)
+
+    def get_counts(self):
+        """
+        Return the letter histograms of all the passages, as an array of
+        shape (passages, 26).
+        """
+        return self._counts
+
+    def puzzles(self, indices, rng=None):
+        """
+        Make a puzzle from each of the passages with the given indices,
+        drawing the letters from the random stream rng (by default, the
+        global one). Returns arrays of (passage index, letter index,
+        removal count).
+        The letters and removal counts are the same as making a ContentItem
+        from each passage in turn with the same stream, and the stream is
+        left where those ContentItems would have left it.
+        """
+        if rng is None:
+            rng = random
+        indices = numpy.asarray(indices, dtype=numpy.int64)
+        cumulative = self._cumulative[indices]
+        totals = cumulative[:, -1]
+        if not totals.all():
+            raise ValueError("A passage has no letters to remove.")
+
+        state = _to_numpy(rng)
+        draws = state.random_sample(len(indices))
+        _from_numpy(rng, state)
+
+        # Each letter is the first whose running total passes the draw.
+        targets = (draws * totals).astype(numpy.int64)
+        letters = (cumulative <= targets[:, None]).sum(axis=1)
+        removals = self._counts[indices, letters]
+        return (indices, letters.astype(numpy.uint8),
+                removals.astype(numpy.uint32))
+
+    def sample(self, count, rng=None):
+        """
+        Make count puzzles from passages chosen at random (with replacement)
+        from the random stream rng. Returns arrays as puzzles() does.
+        """
+        if rng is None:
+            rng = random
+        state = _to_numpy(rng)
+        indices = state.randint(0, len(self._counts), count)
+        _from_numpy(rng, state)
+        return self.puzzles(indices, rng)
@@ -0,0 +1,105 @@
+"""
+Puzzle Benchmark [Omission]
+"""
+
+import argparse
+import random
+import timeit
+
+from omission.game.contentloader import ContentLoader
+from omission.game.contentpack import letter_counts
+from omission.game.item import ContentItem
+
+# The passage sizes to benchmark, in bytes.
+SIZES = (100, 1000, 10000, 100000)
+
+def legacy_item(passage, rng):
+    """
+    Build a puzzle the way ContentItem used to: picking letters until one
+    is alphabetic, then copying the passage one character at a time.
+    Returns (puzzle, puzzle without underscores).
+    """
+    removals = 0
+    while removals == 0:
+        puzzle = ""
+        letter = rng.choice(passage)
+        while not letter.isalpha():
+            letter = rng.choice(passage).lower()
+        for char in passage:
+            if char.lower() == letter:
+                puzzle += "_"
+                removals += 1
+            else:
+                puzzle += char
+
+    concealed = puzzle.replace("_", "").replace("  ", " ")
+    if concealed[0] == " ":
+        concealed = concealed[1:]
+    return (puzzle, concealed[0].upper() + concealed[1:])
+
+def current_item(passage, rng):
+    """
+    Build a puzzle with ContentItem.
+    Returns (puzzle, puzzle without underscores).
+    """
+    item = ContentItem(passage, rng=rng)
+    return (item.get_puzzle(True), item.get_puzzle(False))
+
+def counted_item(passage, rng, counts):
+    """
+    Build a puzzle with ContentItem from the passage's letter histogram,
+    as the ContentLoader does when it has a content pack.
+    Returns (puzzle, puzzle without underscores).
+    """
+    item = ContentItem(passage, counts, rng=rng)
+    return (item.get_puzzle(True), item.get_puzzle(False))
+
+def make_passage(passages, size):
+    """
+    Join passages from the corpus until the text is at least size bytes
+    long, then cut it down to size.
+    """
+    text = ""
+    while len(text) < size:
+        text += random.choice(passages) + " "
+    return text[:size]
+
+def bench(build, passage, number, *args):
+    """
+    Return the mean seconds build takes on the passage, best of three.
+    Any further args are passed on to build.
+    """
+    rng = random.Random(0)
+    timer = timeit.Timer(lambda: build(passage, rng, *args))
+    return min(timer.repeat(3, number)) / number
+
+def main():
+    """
+    Compare the old and new puzzle construction from the command line.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark Omission puzzle construction.")
+    parser.add_argument('--content', default=None,
+                        help="the corpus or content pack to take text from")
+    args = parser.parse_args()
+
+    loader = ContentLoader(args.content)
+    passages = [loader.get_item(i).get_solution()
+                for i in range(min(loader.get_count(), 500))]
+
+    print("{:>8}  {:>12}  {:>12}  {:>8}  {:>12}  {:>8}".format(
+        "bytes", "legacy", "current", "speedup", "counted", "speedup"))
+    for size in SIZES:
+        passage = make_passage(passages, size)
+        # Keep each measurement to a fraction of a second.
+        number = max(10, 100000 // size)
+        legacy = bench(legacy_item, passage, number)
+        current = bench(current_item, passage, number)
+        counted = bench(counted_item, passage, number, letter_counts(passage))
+        print("{:>8}  {:>10.1f}us  {:>10.1f}us  {:>7.1f}x  {:>10.1f}us  "
+              "{:>7.1f}x".format(size, legacy * 1e6, current * 1e6,
+                                 legacy / current, counted * 1e6,
+                                 legacy / counted))
+
+if __name__ == '__main__':
+    main()
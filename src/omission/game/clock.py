@@ -0,0 +1,166 @@
+"""
+Game Clocks [Omission]
+"""
+
+import heapq
+import itertools
+import time
+
+from omission.game.scheduler import get_scheduler
+
+class GameClock(object):
+    """
+    The interface for the clocks that drive a GameTimer. A clock tells the
+    time and calls callbacks once a deadline (in its own time) is reached.
+    """
+
+    def now(self):
+        """
+        Return the current time in seconds.
+        """
+        raise NotImplementedError
+
+    def schedule(self, deadline, callback):
+        """
+        Call callback once now() reaches deadline. Returns a handle which
+        can be passed to cancel().
+        """
+        raise NotImplementedError
+
+    def cancel(self, handle):
+        """
+        Cancel a scheduled callback.
+        """
+        raise NotImplementedError
+
+class ThreadClock(GameClock):
+    """
+    A clock on time.monotonic(), calling callbacks from the shared
+    scheduler thread. This needs no UI, so it suits headless use.
+    """
+
+    def __init__(self, scheduler=None):
+        """
+        Create a new ThreadClock on the given scheduler, or the shared one.
+        """
+        if scheduler is None:
+            scheduler = get_scheduler()
+        self._scheduler = scheduler
+
+    def now(self):
+        """
+        Return the current time in seconds.
+        """
+        return time.monotonic()
+
+    def schedule(self, deadline, callback):
+        """
+        Call callback once now() reaches deadline.
+        """
+        return self._scheduler.schedule(deadline, callback)
+
+    def cancel(self, handle):
+        """
+        Cancel a scheduled callback.
+        """
+        self._scheduler.cancel(handle)
+
+class KivyClock(GameClock):
+    """
+    A clock on time.monotonic(), calling callbacks from the Kivy Clock,
+    so they run on the UI thread in step with the frame.
+    """
+
+    def __init__(self):
+        """
+        Create a new KivyClock.
+        """
+        # Import here, so the rest of the game logic doesn't need Kivy.
+        from kivy.clock import Clock
+        self._clock = Clock
+
+    def now(self):
+        """
+        Return the current time in seconds.
+        """
+        return time.monotonic()
+
+    def schedule(self, deadline, callback):
+        """
+        Call callback on the first frame after now() reaches deadline.
+        """
+        # pylint: disable=W0108
+        return self._clock.schedule_once(lambda dt: callback(),
+                                         max(deadline - self.now(), 0))
+
+    def cancel(self, handle):
+        """
+        Cancel a scheduled callback.
+        """
+        handle.cancel()
+
+class VirtualClock(GameClock):
+    """
+    A clock whose time only moves when advance() or advance_to() is called.
+    Callbacks run on the caller's thread as their deadlines are passed, so
+    tests and simulations can play whole rounds faster than real time.
+    """
+
+    def __init__(self, start=0.0):
+        """
+        Create a new VirtualClock, starting at the given time.
+        """
+        self._now = start
+        # The pending callbacks, as [deadline, sequence, callback] entries.
+        # A cancelled entry has its callback set to None.
+        self._heap = []
+        # Keeps entries with the same deadline in the order they were added.
+        self._sequence = itertools.count()
+
+    def now(self):
+        """
+        Return the current virtual time in seconds.
+        """
+        return self._now
+
+    def schedule(self, deadline, callback):
+        """
+        Call callback once the virtual time reaches deadline.
+        """
+        entry = [deadline, next(self._sequence), callback]
+        heapq.heappush(self._heap, entry)
+        return entry
+
+    def cancel(self, handle):
+        """
+        Cancel a scheduled callback.
+        """
+        handle[2] = None
+
+    def pending(self):
+        """
+        Return the number of callbacks waiting to be called.
+        """
+        return sum(1 for entry in self._heap if entry[2] is not None)
+
+    def advance(self, seconds):
+        """
+        Move the virtual time forward by the given number of seconds.
+        """
+        self.advance_to(self._now + seconds)
+
+    def advance_to(self, moment):
+        """
+        Move the virtual time forward to the given moment, calling every
+        callback that falls due on the way, in order. Each callback sees
+        now() as its own deadline.
+        """
+        while self._heap and self._heap[0][0] <= moment:
+            entry = heapq.heappop(self._heap)
+            callback = entry[2]
+            if callback is None:
+                continue
+            entry[2] = None
+            self._now = max(self._now, entry[0])
+            callback()
+        self._now = max(self._now, moment)
@@ -2,55 +2,347 @@
 Content Loader [Omission]
 """
 
+from array import array
+import hashlib
+import mmap
+import os
+import os.path
 import random
 import re
-import os.path
+import struct
+import threading
 import pkg_resources
 
+from appdirs import user_cache_dir
+
+from omission.game.contentpack import ContentPack, letter_counts, pack_path
+from omission.game.difficulty import DifficultyIndex
+from omission.game.item import ContentItem
+
+# The header of a cached offset index: magic, corpus size, corpus mtime,
+# and the number of passages.
+OFFSETS_HEADER = struct.Struct('<8sQQQ')
+OFFSETS_MAGIC = b'OMOFFS01'
+
+def default_content_path():
+    """
+    Return the path to the content file that ships with the game.
+    """
+    return pkg_resources.resource_filename(
+        __name__,
+        os.path.join(os.pardir, "resources", "content", "content.txt"))
+
+def cache_paths(path, suffix):
+    """
+    Return the candidate paths for a cache file belonging to the given
+    corpus, in order of preference: in the user cache directory, then next
+    to the corpus (for when there is no user cache directory). The corpus
+    is usually installed with the game, where we shouldn't write.
+    """
+    # Corpora in different places may share a name, so the cache is named
+    # for the corpus's full path too.
+    location = hashlib.sha1(
+        os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+    name = os.path.basename(path) + "-" + location + "." + suffix
+    return [os.path.join(user_cache_dir("Omission", "MousePaw Media"), name),
+            path + "." + suffix]
+
+def write_cache(path, suffix, data):
+    """
+    Write a cache file for the given corpus to the first writable location.
+    Failing to write a cache is never fatal.
+    """
+    for cachepath in cache_paths(path, suffix):
+        try:
+            os.makedirs(os.path.dirname(cachepath), 0o777, True)
+            with open(cachepath, 'wb') as cachefile:
+                cachefile.write(data)
+            return cachepath
+        except OSError:
+            continue
+    return None
+
 class ContentLoader(object):
     """
     Loads content from the content file, parses it, and enables
     random retrieval of passages.
+
+    If mapped is True, the content file is memory-mapped instead of read
+    into memory, and only the byte offsets of the passages are kept. A
+    passage is decoded only when it is returned. The content file must use
+    Unix (LF) line endings in this mode.
+
+    If a content pack (see contentpack.py) is given, or one exists beside
+    the content file and is up to date, passages and their letter
+    histograms are read from the pack instead, and the plain-text file is
+    never parsed.
     """
 
-    def __init__(self):
+    def __init__(self, path=None, mapped=False, rng=None):
         """
-        Open the file and load the contents in.
+        Open the file and load the contents in. rng is the random.Random
+        stream to shuffle with; by default, the loader seeds its own.
         """
-        # Seed random.
-        random.seed()
+        # Our random stream.
+        if rng is None:
+            rng = random.Random()
+        self._random = rng
         # Start tracking the last given index.
         self._index = 0
-        # Load the content from the file into an array.
-        path = pkg_resources.resource_filename(
-            __name__,
-            os.path.join(os.pardir, "resources", "content", "content.txt"))
-        with open(path, 'rt', encoding='utf-8') as contentfile:
+        # Use the shipped content unless we were given another file.
+        if path is None:
+            path = default_content_path()
+        self._path = path
+        # The passages (plain mode), the map and offsets (mapped mode),
+        # or the content pack (pack mode).
+        self._content = None
+        self._map = None
+        self._starts = None
+        self._pack = None
+        # The file we actually loaded from: the content file or the pack.
+        self._source = path
+        # The difficulty index, built on first use.
+        self._difficulty = None
+        # The order we walk through the passages in.
+        self._order = None
+        # Guards our walk, so the loader can be shared between threads.
+        self._lock = threading.Lock()
+
+        packpath = self._find_pack()
+        if packpath:
+            self._pack = ContentPack(packpath)
+            self._source = packpath
+            self._order = array('I', range(len(self._pack)))
+        elif mapped:
+            self._load_mapped()
+        else:
+            self._load_text()
+        # Shuffle the content.
+        self.reshuffle()
+
+    def _find_pack(self):
+        """
+        Return the path to the content pack to use, or None if we should
+        use the plain-text content file.
+        """
+        if self._path.endswith(".pack"):
+            return self._path
+        packpath = pack_path(self._path)
+        try:
+            # Only use the pack if it is at least as new as the text.
+            if os.stat(packpath).st_mtime_ns >= os.stat(self._path).st_mtime_ns:
+                return packpath
+        except OSError:
+            pass
+        return None
+
+    def _load_text(self):
+        """
+        Load the whole content file into an array of passages.
+        """
+        with open(self._path, 'rt', encoding='utf-8') as contentfile:
             rawcontent = contentfile.read()
         # Passages are separated by double newlines (blank lines).
         self._content = re.split(r'\n\n', rawcontent)
-        # Shuffle the content.
-        self.reshuffle()
+        self._order = array('I', range(len(self._content)))
+
+    def _load_mapped(self):
+        """
+        Memory-map the content file and load or build the passage offsets.
+        """
+        with open(self._path, 'rb') as contentfile:
+            self._map = mmap.mmap(contentfile.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        stat = os.stat(self._path)
+        self._starts = self._load_offsets(stat)
+        if self._starts is None:
+            self._starts = self._build_offsets()
+            header = OFFSETS_HEADER.pack(OFFSETS_MAGIC, stat.st_size,
+                                         stat.st_mtime_ns, len(self._starts))
+            write_cache(self._path, "offsets",
+                        header + self._starts.tobytes())
+        self._order = array('I', range(len(self._starts)))
+
+    def _load_offsets(self, stat):
+        """
+        Load the cached passage offsets, if a cache exists and matches
+        the content file. Otherwise, returns None.
+        """
+        for cachepath in cache_paths(self._path, "offsets"):
+            try:
+                with open(cachepath, 'rb') as cachefile:
+                    data = cachefile.read()
+            except OSError:
+                continue
+            if len(data) < OFFSETS_HEADER.size:
+                continue
+            magic, size, mtime, count = OFFSETS_HEADER.unpack_from(data)
+            if magic != OFFSETS_MAGIC or size != stat.st_size \
+            or mtime != stat.st_mtime_ns:
+                continue
+            starts = array('Q')
+            starts.frombytes(data[OFFSETS_HEADER.size:])
+            if len(starts) == count:
+                return starts
+        return None
+
+    def _build_offsets(self):
+        """
+        Scan the mapped content file for the start of every passage.
+        """
+        starts = array('Q', [0])
+        # Passages are separated by double newlines (blank lines).
+        position = self._map.find(b'\n\n')
+        while position != -1:
+            starts.append(position + 2)
+            position = self._map.find(b'\n\n', position + 2)
+        return starts
+
+    def _passage(self, index):
+        """
+        Return the passage with the given (unshuffled) index.
+        """
+        if self._pack is not None:
+            return self._pack.passage(index)
+        if self._content is not None:
+            return self._content[index]
+        start = self._starts[index]
+        # Each passage ends at the separator before the next one.
+        if index + 1 < len(self._starts):
+            end = self._starts[index + 1] - 2
+        else:
+            end = len(self._map)
+        return self._map[start:end].decode('utf-8')
+
+    def _next_index(self):
+        """
+        Advance our walk, returning the (unshuffled) index of the passage.
+        """
+        with self._lock:
+            # If we've overshot the length of the array (unlikely)...
+            if self._index >= len(self._order):
+                self._reshuffle()
+            else:
+                # We increment first.
+                self._index += 1
+
+            # Return the item before our current index position.
+            return self._order[self._index-1]
+
+    def get_passage(self, index):
+        """
+        Return the passage with the given (unshuffled) index.
+        """
+        return self._passage(index)
 
     def get_next(self):
         """
         Get a random passage from the file.
         """
-        # If we've overshot the length of the array (unlikely)...
-        if self._index >= len(self._content):
-            self.reshuffle()
-        else:
-            # We increment first.
-            self._index += 1
+        return self._passage(self._next_index())
+
+    def _counts(self, index):
+        """
+        Return the letter histogram of the passage with the given index if
+        we have it from a content pack, else None.
+        """
+        if self._pack is not None:
+            return self._pack.counts(index)
+        return None
+
+    def next_item(self, difficulty=None, rng=None):
+        """
+        Generate a puzzle item from the next random passage, using the
+        passage's letter histogram from the content pack if we have one.
+        The item (and the draw from the difficulty index) uses the random
+        stream rng if given, else the loader's own.
+        If difficulty is given as (min_removals, max_removals), the puzzle
+        is instead drawn from the difficulty index so that its removal
+        count falls in that range (a max of 0 meaning no limit). If no
+        puzzle can match, we fall back to the next random passage.
+        """
+        if difficulty:
+            if rng is None:
+                rng = self._random
+            pair = self.get_difficulty_index().draw(difficulty[0],
+                                                    difficulty[1], rng)
+            if pair:
+                index, letter = pair
+                return self.get_item(index, letter, rng)
+
+        return self.get_item(self._next_index(), None, rng)
+
+    def get_item(self, index, letter=None, rng=None):
+        """
+        Generate a puzzle item from the passage with the given (unshuffled)
+        index, removing the given letter (0-25 for a-z) or a random one
+        chosen with rng (or the loader's own random stream).
+        """
+        if rng is None:
+            rng = self._random
+        return ContentItem(self._passage(index), self._counts(index), letter,
+                           index, rng)
+
+    def get_count(self):
+        """
+        Return the number of passages.
+        """
+        return len(self._order)
+
+    def get_difficulty_index(self):
+        """
+        Return the difficulty index for the content, loading it from the
+        cache or building (and caching) it on first use.
+        """
+        with self._lock:
+            if self._difficulty is None:
+                self._difficulty = self._load_difficulty()
+            return self._difficulty
 
-        # Return the item before our current index position.
-        return self._content[self._index-1]
+    def _load_difficulty(self):
+        """
+        Load the cached difficulty index, or build and cache a new one.
+        """
+        stat = os.stat(self._source)
+        for cachepath in cache_paths(self._source, "difficulty"):
+            try:
+                with open(cachepath, 'rb') as cachefile:
+                    data = cachefile.read()
+            except OSError:
+                continue
+            index = DifficultyIndex.load(data, stat.st_size, stat.st_mtime_ns)
+            if index:
+                return index
 
-    def reshuffle(self, restart=True):
+        # We have to build the index, which means counting every passage's
+        # letters unless the content pack already did that for us.
+        if self._pack is not None:
+            histograms = (self._pack.counts(i) for i in range(len(self._order)))
+        else:
+            histograms = (letter_counts(self._passage(i))
+                          for i in range(len(self._order)))
+        index = DifficultyIndex.build(histograms)
+        write_cache(self._source, "difficulty",
+                    index.dump(stat.st_size, stat.st_mtime_ns))
+        return index
+
+    def reshuffle(self, restart=True, rng=None):
         """
         Reshuffle the content and optionally restart our walk through it.
+        If rng is given, it becomes our random stream from now on, and the
+        new order depends only on it.
+        """
+        with self._lock:
+            if rng is not None:
+                self._random = rng
+                self._order = array('I', range(len(self._order)))
+            self._reshuffle(restart)
+
+    def _reshuffle(self, restart=True):
+        """
+        Reshuffle without taking the lock.
         """
-        # Reshuffle the array of content.
-        random.shuffle(self._content)
+        # Reshuffle the order we walk through the content in.
+        self._random.shuffle(self._order)
         if restart:
             self._index = 0
@@ -0,0 +1,141 @@
+"""
+Content Pack [Omission]
+"""
+
+from array import array
+import argparse
+import mmap
+import re
+import string
+import struct
+import os.path
+
+# Our pack layout, all little-endian:
+# header: magic (8 bytes), passage count (u32), reserved (u32)
+# offsets: one u64 per passage, relative to the start of the text block
+# lengths: one u32 per passage, in bytes
+# histograms: 26 u32 per passage, the count of each letter a-z
+# text: the UTF-8 passages, back to back
+PACK_HEADER = struct.Struct('<8sII')
+PACK_MAGIC = b'OMPACK01'
+LETTERS = string.ascii_lowercase
+
+def letter_counts(passage):
+    """
+    Return the number of instances of each letter a-z in the passage,
+    ignoring case.
+    """
+    lowered = passage.lower()
+    return [lowered.count(letter) for letter in LETTERS]
+
+def pack_path(path):
+    """
+    Return the path of the content pack belonging to a plain-text corpus.
+    """
+    return os.path.splitext(path)[0] + ".pack"
+
+def build_pack(source, destination=None):
+    """
+    Build a content pack from the plain-text corpus at source.
+    Returns the path to the new pack.
+    """
+    if destination is None:
+        destination = pack_path(source)
+
+    with open(source, 'rt', encoding='utf-8') as contentfile:
+        rawcontent = contentfile.read()
+    # Passages are separated by double newlines (blank lines).
+    passages = re.split(r'\n\n', rawcontent)
+
+    offsets = array('Q')
+    lengths = array('I')
+    histograms = array('I')
+    text = bytearray()
+    for passage in passages:
+        encoded = passage.encode('utf-8')
+        offsets.append(len(text))
+        lengths.append(len(encoded))
+        histograms.extend(letter_counts(passage))
+        text += encoded
+
+    with open(destination, 'wb') as packfile:
+        packfile.write(PACK_HEADER.pack(PACK_MAGIC, len(passages), 0))
+        packfile.write(offsets.tobytes())
+        packfile.write(lengths.tobytes())
+        packfile.write(histograms.tobytes())
+        packfile.write(text)
+
+    return destination
+
+class ContentPack(object):
+    """
+    A memory-mapped content pack, giving each passage and its letter
+    histogram by index without parsing the corpus.
+    """
+
+    def __init__(self, path):
+        """
+        Open the content pack at the given path.
+        """
+        with open(path, 'rb') as packfile:
+            self._map = mmap.mmap(packfile.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count, _ = PACK_HEADER.unpack_from(self._map)
+        if magic != PACK_MAGIC:
+            raise ValueError(path + " is not an Omission content pack.")
+
+        position = PACK_HEADER.size
+        self._offsets = array('Q')
+        self._offsets.frombytes(self._map[position:position + count * 8])
+        position += count * 8
+        self._lengths = array('I')
+        self._lengths.frombytes(self._map[position:position + count * 4])
+        position += count * 4
+        self._histograms = array('I')
+        self._histograms.frombytes(self._map[position:position + count * 104])
+        position += count * 104
+        # Where the text block begins.
+        self._text = position
+
+    def __len__(self):
+        """
+        Return the number of passages in the pack.
+        """
+        return len(self._offsets)
+
+    def passage(self, index):
+        """
+        Return the passage at the given index.
+        """
+        start = self._text + self._offsets[index]
+        return self._map[start:start + self._lengths[index]].decode('utf-8')
+
+    def counts(self, index):
+        """
+        Return the letter histogram (a-z) of the passage at the given index.
+        """
+        return self._histograms[index * 26:(index + 1) * 26]
+
+def main():
+    """
+    Build a content pack from the command line.
+    """
+    parser = argparse.ArgumentParser(
+        description="Build an Omission content pack from a plain-text corpus.")
+    parser.add_argument('source', nargs='?', default=None,
+                        help="the corpus to pack (default: shipped content)")
+    parser.add_argument('-o', '--output', default=None,
+                        help="where to write the pack (default: beside source)")
+    args = parser.parse_args()
+
+    source = args.source
+    if source is None:
+        # Import here, so the builder doesn't depend on the loader otherwise.
+        from omission.game.contentloader import default_content_path
+        source = default_content_path()
+
+    destination = build_pack(source, args.output)
+    print("Wrote " + destination)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Content Service [Omission]
+"""
+
+import os
+import threading
+
+from omission.game.contentloader import ContentLoader, default_content_path
+
+# Corpora at least this large (in bytes) are memory-mapped, not read in.
+MAPPED_THRESHOLD = 16 * 1024 * 1024
+
+class ContentService(object):
+    """
+    Owns the single ContentLoader shared by every round, so the corpus is
+    loaded once per process and our walk through it carries over between
+    rounds. The loader is created on first use, or ahead of time in the
+    background via preload().
+    """
+
+    def __init__(self, path=None):
+        """
+        Create a new ContentService for the content file at path, or the
+        shipped content by default. Nothing is loaded yet.
+        """
+        if path is None:
+            path = default_content_path()
+        self._path = path
+        # The shared loader, once loaded.
+        self._loader = None
+        # The background loading thread, if preload() was called.
+        self._thread = None
+        # Ensures we only ever load once.
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """
+        Load the shared loader, if no one else has.
+        """
+        with self._lock:
+            if self._loader is None:
+                try:
+                    mapped = os.path.getsize(self._path) >= MAPPED_THRESHOLD
+                except OSError:
+                    mapped = False
+                self._loader = ContentLoader(self._path, mapped)
+
+    def preload(self):
+        """
+        Start loading the content in the background, if it isn't already.
+        """
+        if self._loader is None and self._thread is None:
+            self._thread = threading.Thread(target=self._load, daemon=True)
+            self._thread.start()
+
+    def is_loaded(self):
+        """
+        Returns True if the content is ready to use, else False.
+        """
+        return self._loader is not None
+
+    def get_loader(self):
+        """
+        Return the shared ContentLoader, loading it (or waiting for the
+        background load to finish) if necessary.
+        """
+        if self._loader is None:
+            self._load()
+        return self._loader
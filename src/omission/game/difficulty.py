@@ -0,0 +1,115 @@
+"""
+Difficulty Index [Omission]
+"""
+
+from array import array
+import struct
+
+# The header of a cached difficulty index: magic, corpus size, corpus mtime,
+# the number of (passage, letter) pairs, and the largest removal count.
+INDEX_HEADER = struct.Struct('<8sQQQQ')
+INDEX_MAGIC = b'OMDIFF01'
+
+class DifficultyIndex(object):
+    """
+    Indexes every (passage, letter) pair in the corpus by how many letters
+    a puzzle made from it would remove, so that a puzzle with a removal
+    count in a given range can be drawn in constant time.
+    """
+
+    def __init__(self, keys, starts):
+        """
+        Create a DifficultyIndex from its arrays. Use build() or load()
+        instead of calling this directly.
+        keys holds (passage * 26 + letter) for every pair, sorted by removal
+        count. starts[count] is the position of the first pair in keys that
+        removes at least count letters.
+        """
+        self._keys = keys
+        self._starts = starts
+
+    @classmethod
+    def build(cls, histograms):
+        """
+        Build the index from an iterable of per-passage letter histograms.
+        """
+        # Bucket every pair by its removal count.
+        buckets = {}
+        for passage, counts in enumerate(histograms):
+            for letter, count in enumerate(counts):
+                if count > 0:
+                    buckets.setdefault(count, array('I')).append(passage * 26 + letter)
+
+        # Lay the buckets out end to end, in order of removal count.
+        keys = array('I')
+        starts = array('I')
+        for count in range(max(buckets, default=0) + 1):
+            starts.append(len(keys))
+            if count in buckets:
+                keys.extend(buckets[count])
+        # The end of the last bucket.
+        starts.append(len(keys))
+        return cls(keys, starts)
+
+    @classmethod
+    def load(cls, data, size, mtime):
+        """
+        Load the index from cached data, if it matches a corpus of the given
+        size and mtime. Otherwise, returns None.
+        """
+        if len(data) < INDEX_HEADER.size:
+            return None
+        magic, csize, cmtime, pairs, maxcount = INDEX_HEADER.unpack_from(data)
+        if magic != INDEX_MAGIC or csize != size or cmtime != mtime:
+            return None
+        position = INDEX_HEADER.size
+        keys = array('I')
+        keys.frombytes(data[position:position + pairs * 4])
+        position += pairs * 4
+        starts = array('I')
+        starts.frombytes(data[position:position + (maxcount + 2) * 4])
+        if len(keys) != pairs or len(starts) != maxcount + 2:
+            return None
+        return cls(keys, starts)
+
+    def dump(self, size, mtime):
+        """
+        Return the index as bytes for caching, for a corpus of the given
+        size and mtime.
+        """
+        header = INDEX_HEADER.pack(INDEX_MAGIC, size, mtime, len(self._keys),
+                                   len(self._starts) - 2)
+        return header + self._keys.tobytes() + self._starts.tobytes()
+
+    def _bounds(self, min_removals, max_removals):
+        """
+        Return the range of positions in keys for the given removal counts.
+        A max_removals of 0 means there is no upper limit.
+        """
+        last = len(self._starts) - 1
+        low = self._starts[min(max(min_removals, 1), last)]
+        if max_removals <= 0 or max_removals >= last:
+            high = self._starts[last]
+        else:
+            high = self._starts[max_removals + 1]
+        return (low, high)
+
+    def count(self, min_removals, max_removals=0):
+        """
+        Return the number of (passage, letter) pairs with a removal count
+        in the given range.
+        """
+        low, high = self._bounds(min_removals, max_removals)
+        return max(high - low, 0)
+
+    def draw(self, min_removals, max_removals, rng):
+        """
+        Draw a random (passage, letter) pair with a removal count in the
+        given range using the random stream rng, as (passage index, letter
+        index). Returns None if there are no such pairs.
+        """
+        low, high = self._bounds(min_removals, max_removals)
+        if high <= low:
+            return None
+        key = self._keys[low + int(rng.random() * (high - low))]
+        return divmod(key, 26)
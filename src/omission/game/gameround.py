@@ -2,10 +2,13 @@
 Gameplay Round [Omission]
 """
 
+from array import array
 from enum import Enum
+import os
+import random
 
 from omission.game.contentloader import ContentLoader
-from omission.game.item import ContentItem
+from omission.game.prefetch import PuzzleQueue
 from omission.game.timer import GameTimer
 
 class GameRound(object):
@@ -17,9 +20,18 @@ class GameRound(object):
 
     # pylint: disable=R0902
     def __init__(self, life_signal, gameover_callback=None, tick_callback=None,
-                 loader=None, settings=None):
+                 loader=None, settings=None, prefetch_depth=0, prefetch_low=1,
+                 prefetch_high=None, clock=None, journal=None, seed=None):
         """
         Create a new gameplay round.
+        clock is the GameClock for the round's timer (see GameTimer).
+        If journal (a JournalWriter) is given, the round is recorded to it
+        so that it can be replayed later.
+        The round draws its puzzles from its own random stream, seeded once
+        from seed, or from the OS if no seed is given.
+        If prefetch_depth is non-zero, puzzles are built ahead of time on a
+        worker thread, keeping up to that many ready. See PuzzleQueue for
+        the meaning of the prefetch_low and prefetch_high watermarks.
         """
         # pylint: disable=R0913
 
@@ -27,11 +39,17 @@ class GameRound(object):
         self._over_callback = gameover_callback
         self._tick_callback = tick_callback
 
+        # Seed our random stream.
+        if seed is None:
+            seed = int.from_bytes(os.urandom(8), 'little')
+        self._seed = seed
+        self._random = random.Random(seed)
+
         # Store the ContentLoader, generating a new one if necessary.
         if loader:
             self._loader = loader
         else:
-            self._loader = ContentLoader()
+            self._loader = ContentLoader(rng=self._random)
 
         # Stores the setting or uses the defaults.
         if settings:
@@ -39,14 +57,21 @@ class GameRound(object):
         else:
             self.settings = GameRoundSettings()
 
+        # The queue of prefetched puzzles, if any.
+        self._queue = None
+        if prefetch_depth > 0:
+            self._queue = PuzzleQueue(self._build_item, prefetch_depth,
+                                      prefetch_low, prefetch_high)
+
         # If we're playing Timed mode...
         if self.settings.mode == GameMode.Timed:
             # Create the timer.
-            self._timer = GameTimer(life_signal, self.settings.limit, self.game_over, self.tick)
+            self._timer = GameTimer(life_signal, self.settings.limit, self.game_over,
+                                    self.tick, clock)
         # Otherwise, for all other modes...
         else:
             # Create an infinite timer.
-            self._timer = GameTimer(life_signal, 0, None, self.tick)
+            self._timer = GameTimer(life_signal, 0, None, self.tick, clock)
 
         # If we're playing Survival mode...
         if self.settings.mode == GameMode.Survival:
@@ -65,13 +90,26 @@ class GameRound(object):
         self._item_score = 0
         # The current chain multiplier. Default 1.
         self._chain = 1
+        # The latency (in seconds since the puzzle was shown) of each answer.
+        self._latencies = array('d')
+
+        # The journal we're recording to, if any.
+        self._journal = journal
+        # Whether new items are being fetched by the round itself, rather
+        # than by a call to new_item() from outside.
+        self._internal = False
+        if self._journal:
+            self._journal.start(self._seed, self._loader.get_count(),
+                                self.settings.get_datastring())
 
     def start_round(self):
         """
         Start the round.
         """
         # Load the first item.
+        self._internal = True
         self.new_item()
+        self._internal = False
         # Start the game timer.
         self._timer.start()
 
@@ -81,11 +119,41 @@ class GameRound(object):
         """
         # Get the new item.
         self._item = None
-        self._item = ContentItem(self._loader.get_next())
+        if self._queue:
+            self._item = self._queue.pop()
+        else:
+            self._item = self._build_item()
         # Reset tries.
         self._try = 0
         # Set a new bookmark on our timer (start of question).
         self._timer.bookmark()
+        # Record the item.
+        if self._journal:
+            self._journal.item(self._timer.get_running_time(),
+                               self._item.get_index(), self._item.get_answer(),
+                               self._internal)
+
+    def _build_item(self):
+        """
+        Build a new content item for the round's settings.
+        """
+        return self._loader.next_item(self.settings.get_difficulty(),
+                                      self._random)
+
+    def get_seed(self):
+        """
+        Return the seed of the round's random stream.
+        """
+        return self._seed
+
+    def get_prefetch_stats(self):
+        """
+        Returns the prefetch statistics as (pops, misses), where misses is
+        the number of new items that had to wait for the queue.
+        """
+        if self._queue:
+            return self._queue.get_stats()
+        return (0, 0)
 
     def get_status(self):
         """
@@ -102,11 +170,18 @@ class GameRound(object):
         else:
             lives = 0
 
-        has_chain = self._chain > 1
+        has_chain = self._chain > 1 and not self._chain_expired()
 
         return (self.settings.mode, remaining,
                 self._timer.get_seconds(), lives, has_chain)
 
+    def _chain_expired(self):
+        """
+        Returns True if the current puzzle has gone unanswered for too long
+        to extend the chain, else False.
+        """
+        return self._timer.since_bookmark() >= self.settings.chain
+
     def get_puzzle(self):
         """
         Returns the text of the current puzzle as a tuple (puzzle, removals),
@@ -140,10 +215,35 @@ class GameRound(object):
 
     def answer(self, letter, progress=False):
         """
-        Pass answer in. Returns a GameStatus.
+        Pass answer in. Returns a GameStatus, or None if the time had
+        already run out.
         If progress is True, it will automatically fetch the next item.
         """
+        moment = self._timer.get_running_time()
+        # An answer that comes in after the time ran out, but before the
+        # timer got to end the game, is too late; the game ends now. This
+        # way, the end doesn't depend on how late the clock fires.
+        if self._timer.check_done():
+            status = None
+        else:
+            self._internal = True
+            status = self._answer(letter, progress)
+            self._internal = False
+        # Record the answer.
+        if self._journal:
+            self._journal.answer(moment, letter, progress, status)
+        return status
+
+    def _answer(self, letter, progress):
+        """
+        Check the answer and update the round. Returns a GameStatus.
+        """
         if self._item:
+            # Record how long this answer took.
+            self._latencies.append(self._timer.latency())
+            # If we had a chain but it expired before this answer...
+            if self._chain_expired():
+                self._chain = 1
             # If the answer is correct.
             if self._item.check_answer(letter):
                 # Calculate score.
@@ -208,15 +308,16 @@ class GameRound(object):
         # The attempt bonus.
         # +1x for each remaining try.
         try_bonus = self.settings.tries-self._try
-        # The time bonus.
-        # 5s = +1x, 4s = +2x...1s = +5x
+        # The time bonus, to the millisecond.
+        # 5s = +1x, 4s = +2x...1s = +5x, 0.5s = +5.5x
         time = self._timer.since_bookmark()
         if time > 6:
             time = 6
         time_bonus = 6 - time
 
         # Calculate item score WITH current chain.
-        self._item_score = base_score * (try_bonus + time_bonus) * self._chain
+        self._item_score = int(round(base_score * (try_bonus + time_bonus)
+                                     * self._chain))
         # Add to the main score.
         self._score += self._item_score
 
@@ -232,6 +333,13 @@ class GameRound(object):
         """
         return (self._score, self._item_score, self._chain)
 
+    def get_latencies(self):
+        """
+        Get the latency of every answer so far, in seconds since its puzzle
+        was shown, not counting pauses.
+        """
+        return list(self._latencies)
+
     def get_solution(self):
         """
         Get the puzzle solution as (letter, puzzle).
@@ -270,13 +378,24 @@ class GameRound(object):
         if self._over_callback:
             self._over_callback()
 
+    def close(self):
+        """
+        Release the round's resources when leaving the game.
+        """
+        self._timer.stop()
+        if self._queue:
+            self._queue.stop()
+        # Finish the journal.
+        if self._journal:
+            self._journal.end(self._timer.get_running_time(), self._score)
+            self._journal = None
+
     def tick(self):
         """
         Runs every second.
         """
-        # If we had a chain but it should have expired...
-        if self._chain > 1 and self._timer.since_bookmark() >= self.settings.chain:
-            self._chain = 1
+        # Chains expire by the time of the next answer (see answer()), not
+        # here, as ticks can fire late.
         # If we have a tick callback, call it now...
         if self._tick_callback:
             self._tick_callback()
@@ -320,6 +439,9 @@ class GameRoundSettings(object):
         self.chain = 2
         # Whether to pause on solution.
         self.solution_pause = True
+        # The range of letters a puzzle may remove. 0 means no limit.
+        self.min_removals = 0
+        self.max_removals = 0
 
     def set_timed(self, time=30, bonus=2, penalty=1, tries=3):
         """
@@ -367,6 +489,53 @@ class GameRoundSettings(object):
         self.count_at = count_at
         self.clue_at = clue_at
 
+    def set_difficulty(self, min_removals=0, max_removals=0):
+        """
+        Set the target difficulty, as the range of letters a puzzle may
+        remove. If max_removals is 0, there is no upper limit.
+        """
+        self.min_removals = min_removals
+        self.max_removals = max_removals
+
+    def get_difficulty(self):
+        """
+        Get the target difficulty as (min_removals, max_removals), or None
+        if puzzles may be of any difficulty.
+        """
+        if self.min_removals <= 1 and self.max_removals == 0:
+            return None
+        return (self.min_removals, self.max_removals)
+
+    def set_datastring(self, datastring):
+        """
+        Load the settings from a datastring (see get_datastring()).
+        """
+        tokens = datastring.split(":")
+        values = [int(token) for token in tokens[1:]]
+        # T:time:bonus:penalty:tries:hint:clue:chain:solution
+        if tokens[0] == "T":
+            self.set_timed(values[0], values[1], values[2], values[3])
+            values = values[4:]
+        # S:lives:tries:hint:clue:chain:solution
+        elif tokens[0] == "S":
+            self.set_survival(values[0], values[1])
+            values = values[2:]
+        # I:tries:hint:clue:chain:solution
+        elif tokens[0] == "I":
+            self.set_infinite(values[0])
+            values = values[1:]
+        else:
+            raise ValueError("Unknown game mode in datastring " + datastring)
+
+        self.set_clues(values[0], values[1])
+        self.set_chain(values[2])
+        self.set_solution_pause(bool(values[3]))
+        # ...:min_removals:max_removals
+        if len(values) >= 6:
+            self.set_difficulty(values[4], values[5])
+        else:
+            self.set_difficulty()
+
     def get_datastring(self):
         """
         Get the datastring representing the settings.
@@ -405,4 +574,12 @@ class GameRoundSettings(object):
                 str(self.chain) + ":" + \
                 str(int(self.solution_pause))
 
+        # Only rounds with a target difficulty carry it, so that the
+        # datastrings of existing scoreboards are unchanged.
+        # ...:min_removals:max_removals
+        if self.get_difficulty():
+            output += ":" + \
+                str(self.min_removals) + ":" + \
+                str(self.max_removals)
+
         return output
@@ -2,48 +2,69 @@
 Content Item [Omission]
 """
 
+from array import array
 import random
+import string
+
+from omission.game.contentpack import letter_counts
 
 class ContentItem(object):
     """
-    A single content item.
+    A single content item. The item only refers to its passage; the puzzle
+    text and the positions of the removed letters are made on demand and
+    kept once made, so queues of waiting items stay small.
     """
 
-    def __init__(self, passage):
+    __slots__ = ('_original', '_index', '_letter', '_removals', '_positions',
+                 '_puzzle', '_concealed')
+
+    def __init__(self, passage, counts=None, letter=None, index=-1, rng=None):
         """
-        Generates a new puzzle item from the given passage.
+        Generates a new puzzle item from the given passage, removing one of
+        the letters a-z. If counts, the passage's letter histogram (a-z), is
+        given, the letter and the number of removals are taken from it
+        without scanning the passage.
+        If letter (an index 0-25 for a-z) is given, that letter is removed
+        instead of a random one. index is the passage's index in its
+        ContentLoader, if known. rng is the random.Random stream to pick
+        the letter with; by default, the global one.
         """
         # Store the input passage as the original.
         self._original = passage
-        # Store the number of instances of the letter we remove.
-        self._removals = 0
-
-        # Prepare random.
-        random.seed()
+        # Store where the passage came from.
+        self._index = index
+        # The positions of the removed letters, and the puzzle with and
+        # without underscores, all made on demand.
+        self._positions = None
+        self._puzzle = None
+        self._concealed = None
 
-        # There is an occasional glitch where no letters are removed.
-        # This is a safeguard against that.
-        while self._removals == 0:
-            # Generate the puzzle by removing all instances of the
-            # selected letter from the passage. Be sure to retain the
-            # original passage for reference.
-            self._puzzle = ""
-            # Select a random letter from the passage.
-            self._letter = random.choice(self._original)
-            while not self._letter.isalpha():
-                self._letter = random.choice(self._original).lower()
+        # Everything we need comes from the passage's letter histogram, so
+        # count the letters if we weren't given it.
+        if counts is None:
+            counts = letter_counts(passage)
+        if letter is None:
+            letter = self._pick(counts, rng or random)
+        self._letter = string.ascii_lowercase[letter]
+        # Store the number of instances of the letter we remove.
+        self._removals = counts[letter]
 
-            # We do this manually in a loop for the express purpose of
-            # tracking the number of removals we did.
-            for char in self._original:
-                # We replace all removed letters with underscores,
-                # incrementing our removal counter for each removed.
-                if char.lower() == self._letter:
-                    self._puzzle += "_"
-                    self._removals += 1
-                # All other characters are copied.
-                else:
-                    self._puzzle += char
+    @staticmethod
+    def _pick(counts, rng):
+        """
+        Pick the index of a letter from the passage's letter histogram,
+        weighted by how often it appears. This is the same as picking a
+        random letter from the passage.
+        """
+        total = sum(counts)
+        if total == 0:
+            raise ValueError("The passage has no letters to remove.")
+        target = int(rng.random() * total)
+        for bucket, count in enumerate(counts):
+            if target < count:
+                return bucket
+            target -= count
+        return len(counts) - 1
 
     def get_puzzle(self, underscores=False):
         """
@@ -51,20 +72,45 @@ class ContentItem(object):
         """
         # If requested, return the puzzle with the underscores still in place.
         if underscores:
+            if self._puzzle is None:
+                # Replace all instances of the letter with underscores. Two
+                # replaces are much faster than a single translate().
+                self._puzzle = self._original.replace(self._letter, "_") \
+                    .replace(self._letter.upper(), "_")
             return self._puzzle
-        # Otherwise, return the puzzle with underscores removed.
-        else:
-            # Make a copy without the underscores.
-            puzzle = self._puzzle.replace("_", "")
-            # Remove double spaces to conceal missing words.
-            puzzle = puzzle.replace("  ", " ")
-            # If we lead with a space...
-            if puzzle[0] == " ":
+        # Otherwise, return the puzzle with underscores removed, making it
+        # the first time we're asked.
+        if self._concealed is None:
+            # Drop the letter, and remove double spaces to conceal missing
+            # words.
+            puzzle = self.get_puzzle(True).replace("_", "").replace("  ", " ")
+            # Drop a leading space and capitalize the first letter without
+            # changing the other letters.
+            if puzzle[:1] == " ":
                 puzzle = puzzle[1:]
-            # Capitalize the first letter without changing the other letters.
-            puzzle = puzzle[0].upper() + puzzle[1:]
-            # Return the modified form.
-            return puzzle
+            self._concealed = puzzle[:1].upper() + puzzle[1:]
+        return self._concealed
+
+    def get_positions(self):
+        """
+        Return the positions of the removed letters in the passage, as an
+        array of unsigned ints.
+        """
+        if self._positions is None:
+            positions = array('I')
+            lowered = self._original.lower()
+            position = lowered.find(self._letter)
+            while position >= 0:
+                positions.append(position)
+                position = lowered.find(self._letter, position + 1)
+            self._positions = positions
+        return self._positions
+
+    def get_index(self):
+        """
+        Return the index of the passage in its ContentLoader, or -1.
+        """
+        return self._index
 
     def get_answer(self):
         """
@@ -0,0 +1,184 @@
+"""
+Round Journal [Omission]
+"""
+
+import argparse
+import struct
+import time
+
+from omission.game.clock import VirtualClock
+from omission.game.contentloader import ContentLoader
+from omission.game.gameround import GameRound, GameRoundSettings, GameStatus
+
+# Our journal layout, all little-endian:
+# header: magic (8 bytes), RNG seed (u64), number of passages in the
+#         corpus (u32), length of the settings datastring (u16),
+#         then the settings datastring itself
+# records, each a type byte, the round's running time (f64), then:
+#   ITEM:   passage index (u32), letter 0-25 (u8), whether the item was
+#           fetched by start_round() or answer() rather than new_item() (u8)
+#   ANSWER: letter codepoint (u32), progress flag (u8), GameStatus (u8)
+#   END:    final score (i64)
+JOURNAL_HEADER = struct.Struct('<8sQIH')
+JOURNAL_MAGIC = b'OMJRNL01'
+RECORD = struct.Struct('<BdIBB')
+END_RECORD = struct.Struct('<Bdq')
+ITEM = ord('I')
+ANSWER = ord('A')
+END = ord('E')
+
+STATUS_CODES = {GameStatus.Incorrect: 1, GameStatus.Skipped: 2,
+                GameStatus.Correct: 3}
+
+class JournalWriter(object):
+    """
+    Writes the journal of a single round: everything needed to play the
+    round again and get the same score.
+    """
+
+    def __init__(self, path):
+        """
+        Create a new JournalWriter, writing to the file at path. A journal
+        holds one round, so any file already there is replaced.
+        """
+        self._file = open(path, 'wb')
+
+    def start(self, seed, passages, datastring):
+        """
+        Write the journal header.
+        """
+        encoded = datastring.encode('utf-8')
+        self._file.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, seed, passages,
+                                             len(encoded)))
+        self._file.write(encoded)
+
+    def item(self, moment, index, letter, internal):
+        """
+        Record a new puzzle item.
+        """
+        self._file.write(RECORD.pack(ITEM, moment, index,
+                                     ord(letter) - ord('a'), internal))
+
+    def answer(self, moment, letter, progress, status):
+        """
+        Record an answer and the status it got.
+        """
+        self._file.write(RECORD.pack(ANSWER, moment, ord(letter), progress,
+                                     STATUS_CODES.get(status, 0)))
+
+    def end(self, moment, score):
+        """
+        Record the end of the round and close the journal.
+        """
+        self._file.write(END_RECORD.pack(END, moment, score))
+        self._file.close()
+
+def read_journal(data):
+    """
+    Parse a journal. Returns (seed, passages, datastring, records), where
+    each record is a tuple starting with its type and running time.
+    """
+    magic, seed, passages, length = JOURNAL_HEADER.unpack_from(data)
+    if magic != JOURNAL_MAGIC:
+        raise ValueError("Not an Omission round journal.")
+    position = JOURNAL_HEADER.size
+    datastring = bytes(data[position:position + length]).decode('utf-8')
+    position += length
+
+    records = []
+    while position < len(data):
+        if data[position] == END:
+            records.append(END_RECORD.unpack_from(data, position))
+            position += END_RECORD.size
+        else:
+            records.append(RECORD.unpack_from(data, position))
+            position += RECORD.size
+    return (seed, passages, datastring, records)
+
+class _ReplayLoader(object):
+    """
+    Stands in for the ContentLoader during a replay, giving back the
+    journaled items in order.
+    """
+
+    def __init__(self, loader, items):
+        self._loader = loader
+        self._items = iter(items)
+
+    def next_item(self, difficulty=None, rng=None):
+        """
+        Return the next journaled item.
+        """
+        # pylint: disable=W0613
+        index, letter = next(self._items)
+        return self._loader.get_item(index, letter, rng)
+
+def replay(data, loader):
+    """
+    Play a journaled round again on a virtual clock.
+    Returns (journaled score, replayed score); they match if the round
+    was played fairly and the scoring rules haven't changed. A journal
+    without an END record has a journaled score of None.
+    """
+    seed, passages, datastring, records = read_journal(data)
+    if passages != loader.get_count():
+        raise ValueError("The journal was recorded on different content.")
+
+    settings = GameRoundSettings()
+    settings.set_datastring(datastring)
+    items = [(record[2], record[3]) for record in records
+             if record[0] == ITEM]
+
+    clock = VirtualClock()
+    gameround = GameRound(lambda die: None, None, None,
+                          _ReplayLoader(loader, items), settings, clock=clock,
+                          seed=seed)
+    gameround.start_round()
+
+    journaled = None
+    statuses = {code: status for status, code in STATUS_CODES.items()}
+    # The first item was fetched by start_round().
+    for record in records[1:]:
+        clock.advance_to(record[1])
+        if record[0] == ITEM:
+            # Items fetched by answer() are fetched again as we replay it.
+            if not record[4]:
+                gameround.new_item()
+        elif record[0] == ANSWER:
+            status = gameround.answer(chr(record[2]), bool(record[3]))
+            if status != statuses.get(record[4]):
+                break
+        elif record[0] == END:
+            journaled = record[2]
+    gameround.close()
+    return (journaled, gameround.get_score()[0])
+
+def main():
+    """
+    Verify round journals from the command line.
+    """
+    parser = argparse.ArgumentParser(
+        description="Replay Omission round journals and verify their scores.")
+    parser.add_argument('journals', nargs='+')
+    parser.add_argument('--content', default=None,
+                        help="the corpus or content pack the rounds used")
+    args = parser.parse_args()
+
+    loader = ContentLoader(args.content)
+    mismatches = 0
+    started = time.perf_counter()
+    for path in args.journals:
+        with open(path, 'rb') as journalfile:
+            journaled, replayed = replay(journalfile.read(), loader)
+        if journaled != replayed:
+            mismatches += 1
+            print("MISMATCH " + path + ": journaled " + str(journaled) +
+                  ", replayed " + str(replayed))
+    elapsed = time.perf_counter() - started
+
+    print("Verified {} journals in {:.2f}s ({:.0f}/s), {} mismatched.".format(
+        len(args.journals), elapsed, len(args.journals) / max(elapsed, 1e-9),
+        mismatches))
+
+if __name__ == '__main__':
+    main()
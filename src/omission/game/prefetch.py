@@ -0,0 +1,115 @@
+"""
+Puzzle Prefetch Queue [Omission]
+"""
+
+from collections import deque
+import threading
+
+class PuzzleQueue(object):
+    """
+    A bounded queue of ready-made puzzle items, filled in the background
+    by a worker thread so that getting the next puzzle never has to build
+    one on the caller's thread.
+    """
+    # pylint: disable=R0902
+
+    def __init__(self, factory, depth=3, low_water=1, high_water=None):
+        """
+        Create a new PuzzleQueue and start filling it. factory is called
+        (on the worker thread) to build each item. When the queue drops to
+        low_water items, the worker refills it up to high_water items,
+        which defaults to (and may not exceed) depth.
+        """
+        # pylint: disable=R0913
+        if high_water is None or high_water > depth:
+            high_water = depth
+        if low_water >= high_water:
+            low_water = high_water - 1
+
+        self._factory = factory
+        self._low_water = low_water
+        self._high_water = high_water
+        # The ready-made items.
+        self._items = deque()
+        # Guards the items and wakes the worker and waiting callers.
+        self._condition = threading.Condition()
+        # Whether the worker should keep running.
+        self._running = True
+        # An error raised by the factory, to be raised again on pop().
+        self._error = None
+
+        # The number of pops, and how many of those found the queue empty.
+        self.pops = 0
+        self.misses = 0
+
+        self._thread = threading.Thread(target=self._fill, daemon=True)
+        self._thread.start()
+
+    def _fill(self):
+        """
+        The worker loop, which refills the queue whenever it runs low.
+        """
+        while True:
+            with self._condition:
+                # Sleep until we've dropped to the low watermark.
+                while self._running and len(self._items) > self._low_water:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                needed = self._high_water - len(self._items)
+
+            for _ in range(needed):
+                # Build the item outside of the lock, so pop() isn't blocked.
+                try:
+                    item = self._factory()
+                except Exception as error: # pylint: disable=W0703
+                    with self._condition:
+                        self._error = error
+                        self._running = False
+                        self._condition.notify_all()
+                    return
+
+                with self._condition:
+                    if not self._running:
+                        return
+                    self._items.append(item)
+                    self._condition.notify_all()
+
+    def pop(self):
+        """
+        Return the next item. If the queue is empty, this waits for the
+        worker to finish building one.
+        """
+        with self._condition:
+            self.pops += 1
+            if not self._items:
+                self.misses += 1
+            while not self._items:
+                if self._error:
+                    raise self._error
+                if not self._running:
+                    raise RuntimeError("The puzzle queue has been stopped.")
+                self._condition.wait()
+
+            item = self._items.popleft()
+            # Wake the worker if we've hit the low watermark.
+            if len(self._items) <= self._low_water:
+                self._condition.notify_all()
+            return item
+
+    def get_stats(self):
+        """
+        Returns the queue statistics as (pops, misses), where misses is the
+        number of pops that found the queue empty.
+        """
+        with self._condition:
+            return (self.pops, self.misses)
+
+    def stop(self):
+        """
+        Stop the worker and discard any remaining items.
+        """
+        with self._condition:
+            self._running = False
+            self._items.clear()
+            self._condition.notify_all()
@@ -0,0 +1,116 @@
+"""
+Timer Scheduler [Omission]
+"""
+
+import heapq
+import itertools
+import threading
+import time
+import traceback
+
+class Scheduler(object):
+    """
+    Runs callbacks at deadlines on the monotonic clock, all from a single
+    thread. The thread is only alive while callbacks are pending.
+    """
+
+    # The number of scheduler threads currently alive, across all schedulers.
+    live_threads = 0
+    _live_lock = threading.Lock()
+
+    def __init__(self):
+        """
+        Create a new Scheduler.
+        """
+        # The pending callbacks, as [deadline, sequence, callback] entries.
+        # A cancelled entry has its callback set to None.
+        self._heap = []
+        # Keeps entries with the same deadline in the order they were added.
+        self._sequence = itertools.count()
+        # Guards the heap and wakes the thread when it changes.
+        self._condition = threading.Condition()
+        # The scheduler thread, if it is running.
+        self._thread = None
+
+    def schedule(self, deadline, callback):
+        """
+        Call callback once time.monotonic() reaches deadline. Returns a
+        handle which can be passed to cancel().
+        """
+        entry = [deadline, next(self._sequence), callback]
+        with self._condition:
+            heapq.heappush(self._heap, entry)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                with Scheduler._live_lock:
+                    Scheduler.live_threads += 1
+                self._thread.start()
+            else:
+                self._condition.notify()
+        return entry
+
+    def cancel(self, handle):
+        """
+        Cancel a scheduled callback. Once this returns, the callback will
+        not be called (unless it had already started).
+        """
+        with self._condition:
+            handle[2] = None
+            self._condition.notify()
+
+    def _run(self):
+        """
+        The scheduler loop, which calls each callback at its deadline.
+        """
+        self._condition.acquire()
+        try:
+            while True:
+                # Discard cancelled entries.
+                while self._heap and self._heap[0][2] is None:
+                    heapq.heappop(self._heap)
+                # If nothing is left to do, the thread exits.
+                if not self._heap:
+                    self._thread = None
+                    with Scheduler._live_lock:
+                        Scheduler.live_threads -= 1
+                    return
+
+                wait = self._heap[0][0] - time.monotonic()
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+
+                entry = heapq.heappop(self._heap)
+                callback = entry[2]
+                entry[2] = None
+                # Run the callback without holding the lock, so it can
+                # schedule and cancel as it needs to.
+                self._condition.release()
+                try:
+                    callback()
+                except Exception: # pylint: disable=W0703
+                    traceback.print_exc()
+                finally:
+                    self._condition.acquire()
+        finally:
+            self._condition.release()
+
+# The scheduler shared by all game timers.
+_SHARED = None
+_SHARED_LOCK = threading.Lock()
+
+def get_scheduler():
+    """
+    Return the shared Scheduler, creating it if necessary.
+    """
+    global _SHARED # pylint: disable=W0603
+    with _SHARED_LOCK:
+        if _SHARED is None:
+            _SHARED = Scheduler()
+        return _SHARED
+
+def live_timer_threads():
+    """
+    Return the number of scheduler threads currently alive.
+    """
+    return Scheduler.live_threads
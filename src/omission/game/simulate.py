@@ -0,0 +1,327 @@
+"""
+Headless Round Simulation [Omission]
+"""
+
+import argparse
+import multiprocessing
+import random
+import statistics
+import string
+import time
+
+from omission.game.clock import VirtualClock
+from omission.game.contentloader import ContentLoader
+from omission.game.gameround import GameMode, GameRound, GameRoundSettings
+from omission.game.gameround import GameStatus
+
+# Letters from most to least common in English text.
+LETTER_FREQUENCY = "etaoinshrdlcumwfgypbvkjxqz"
+
+# The rounds in each batch sent to a worker process.
+BATCH_ROUNDS = 50
+
+class Bot(object):
+    """
+    A simulated player. Every guess comes with how long the bot took to
+    make it.
+    """
+
+    def __init__(self, rng, latency=(0.5, 4.0)):
+        """
+        Create a new Bot, using rng for its choices. latency is the range of
+        seconds, (low, high), that the bot takes to think.
+        """
+        self._rng = rng
+        self._latency = latency
+
+    def think(self):
+        """
+        Return how many seconds the bot takes to make its next guess.
+        """
+        return self._rng.uniform(*self._latency)
+
+    def guess(self, gameround, guessed):
+        """
+        Return the bot's next guess for the current puzzle, given the
+        letters it has already guessed (wrongly) on it.
+        """
+        raise NotImplementedError
+
+class RandomBot(Bot):
+    """
+    Guesses letters at random.
+    """
+
+    def guess(self, gameround, guessed):
+        """
+        Guess any letter we haven't tried yet.
+        """
+        letters = [letter for letter in string.ascii_lowercase
+                   if letter not in guessed]
+        return self._rng.choice(letters)
+
+class FrequencyBot(Bot):
+    """
+    Guesses the most common English letters that look to be missing.
+    """
+
+    def guess(self, gameround, guessed):
+        """
+        Guess the most common letter we haven't tried that doesn't appear
+        in the puzzle, or failing that, the most common letter untried.
+        """
+        text = gameround.get_puzzle()[0].lower()
+        untried = [letter for letter in LETTER_FREQUENCY
+                   if letter not in guessed]
+        for letter in untried:
+            if letter not in text:
+                return letter
+        return untried[0]
+
+class ScriptedBot(Bot):
+    """
+    Knows the answer, but only gives it with a set accuracy, and takes a
+    normally distributed time to think.
+    """
+
+    def __init__(self, rng, accuracy=0.7, mean=2.0, deviation=0.75):
+        """
+        Create a new ScriptedBot, which answers correctly with probability
+        accuracy, and takes mean (+/- deviation) seconds to think.
+        """
+        super().__init__(rng)
+        self._accuracy = accuracy
+        self._mean = mean
+        self._deviation = deviation
+
+    def think(self):
+        """
+        Return how many seconds the bot takes to make its next guess.
+        """
+        return max(self._rng.gauss(self._mean, self._deviation), 0.05)
+
+    def guess(self, gameround, guessed):
+        """
+        Guess the answer, or a wrong letter we haven't tried.
+        """
+        answer = gameround.get_solution()[0]
+        if self._rng.random() < self._accuracy:
+            return answer
+        letters = [letter for letter in string.ascii_lowercase
+                   if letter != answer and letter not in guessed]
+        return self._rng.choice(letters)
+
+BOTS = {
+    'random': RandomBot,
+    'frequency': FrequencyBot,
+    'scripted': ScriptedBot
+}
+
+def play_round(loader, settings, bot, max_items=100, max_time=3600, seed=None):
+    """
+    Play a single round with the given bot on a virtual clock, seeding the
+    round's random stream with seed.
+    Returns (score, virtual seconds, puzzles answered).
+    The round also ends after max_items puzzles or max_time seconds, which
+    keeps Infinite rounds (and skilled bots) from playing forever.
+    """
+    clock = VirtualClock()
+    over = []
+    gameround = GameRound(lambda die: None, lambda: over.append(True), None,
+                          loader, settings, clock=clock, seed=seed)
+    gameround.start_round()
+
+    items = 0
+    guessed = []
+    while not over and items < max_items and clock.now() < max_time:
+        letter = bot.guess(gameround, guessed)
+        clock.advance(bot.think())
+        # The time may have run out while the bot was thinking.
+        if over:
+            break
+        status = gameround.answer(letter, True)
+        if status == GameStatus.Incorrect:
+            guessed.append(letter)
+        else:
+            guessed = []
+            items += 1
+            # Only Survival mode moves on from a skipped puzzle by itself.
+            if status == GameStatus.Skipped \
+            and settings.mode != GameMode.Survival:
+                gameround.new_item()
+
+    gameround.close()
+    return (gameround.get_score()[0], clock.now(), items)
+
+# The content loader for each worker process.
+_LOADER = None
+
+def _init_worker(path):
+    """
+    Load the content once in each worker process.
+    """
+    global _LOADER # pylint: disable=W0603
+    _LOADER = ContentLoader(path)
+
+def _play_batch(task):
+    """
+    Play a batch of rounds in a worker process.
+    """
+    settings, botname, botargs, seed, count, max_items = task
+    rng = random.Random(seed)
+    bot = BOTS[botname](rng, **botargs)
+    # Walk the content in an order set by the batch seed, so a simulation
+    # with a seed plays the same puzzles every time.
+    _LOADER.reshuffle(rng=random.Random(rng.getrandbits(64)))
+    return [play_round(_LOADER, settings, bot, max_items, seed=rng.getrandbits(64))
+            for _ in range(count)]
+
+def _percentile(ordered, fraction):
+    """
+    Return the given fraction (0-1) of the way through the sorted values,
+    interpolating between them.
+    """
+    position = fraction * (len(ordered) - 1)
+    below = int(position)
+    above = min(below + 1, len(ordered) - 1)
+    return ordered[below] + (ordered[above] - ordered[below]) * \
+        (position - below)
+
+class SimulationReport(object):
+    """
+    The results of a simulation.
+    """
+
+    def __init__(self, results, wall_time):
+        """
+        Create a new report from a list of (score, seconds, items) results
+        and the real time the simulation took.
+        """
+        self.scores = [result[0] for result in results]
+        self.lengths = [result[1] for result in results]
+        self.items = [result[2] for result in results]
+        self.wall_time = wall_time
+
+    def rounds_per_second(self):
+        """
+        Return the simulation throughput.
+        """
+        if self.wall_time <= 0:
+            return 0
+        return len(self.scores) / self.wall_time
+
+    @staticmethod
+    def _summary(values):
+        """
+        Return a one-line summary of a distribution.
+        """
+        if len(values) < 2:
+            return str(values)
+        ordered = sorted(values)
+        return "mean {:.1f}, stdev {:.1f}, min {:.1f}, p10 {:.1f}, " \
+               "median {:.1f}, p90 {:.1f}, max {:.1f}".format(
+                   statistics.mean(values), statistics.stdev(values),
+                   ordered[0], _percentile(ordered, 0.1),
+                   statistics.median(values), _percentile(ordered, 0.9),
+                   ordered[-1])
+
+    def __str__(self):
+        """
+        Return the report as text.
+        """
+        return "Rounds:  {} in {:.2f}s ({:.0f} rounds/s)\n" \
+               "Score:   {}\n" \
+               "Seconds: {}\n" \
+               "Puzzles: {}".format(len(self.scores), self.wall_time,
+                                    self.rounds_per_second(),
+                                    self._summary(self.scores),
+                                    self._summary(self.lengths),
+                                    self._summary(self.items))
+
+def simulate(settings, rounds, botname='random', botargs=None, workers=None,
+             seed=None, max_items=100, path=None):
+    """
+    Simulate the given number of rounds across a pool of worker processes,
+    one per core by default. Returns a SimulationReport.
+    """
+    # pylint: disable=R0913
+    if botargs is None:
+        botargs = {}
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    rng = random.Random(seed)
+
+    # Split the rounds into batches of a fixed size, whatever the number of
+    # workers, so a seed gives the same rounds however many there are.
+    tasks = []
+    for first in range(0, rounds, BATCH_ROUNDS):
+        tasks.append((settings, botname, botargs, rng.getrandbits(64),
+                      min(BATCH_ROUNDS, rounds - first), max_items))
+
+    started = time.perf_counter()
+    with multiprocessing.Pool(workers, _init_worker, (path,)) as pool:
+        results = []
+        # Keep the batches in order, so the results are too.
+        for batch in pool.imap(_play_batch, tasks):
+            results.extend(batch)
+    return SimulationReport(results, time.perf_counter() - started)
+
+def main():
+    """
+    Run a simulation from the command line.
+    """
+    parser = argparse.ArgumentParser(
+        description="Simulate rounds of Omission with bot players.")
+    parser.add_argument('-n', '--rounds', type=int, default=1000)
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="worker processes (default: one per core)")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--content', default=None,
+                        help="the corpus or content pack to play from")
+    parser.add_argument('--mode', choices=['timed', 'survival', 'infinite'],
+                        default='timed')
+    parser.add_argument('--limit', type=int, default=None,
+                        help="seconds (Timed) or lives (Survival)")
+    parser.add_argument('--tries', type=int, default=None)
+    parser.add_argument('--bonus', type=int, default=None)
+    parser.add_argument('--penalty', type=int, default=None)
+    parser.add_argument('--chain', type=int, default=None)
+    parser.add_argument('--count-at', type=int, default=None)
+    parser.add_argument('--clue-at', type=int, default=None)
+    parser.add_argument('--max-items', type=int, default=100,
+                        help="end each round after this many puzzles")
+    parser.add_argument('--bot', choices=sorted(BOTS), default='random')
+    parser.add_argument('--accuracy', type=float, default=0.7,
+                        help="scripted bot: chance of a correct guess")
+    parser.add_argument('--latency-mean', type=float, default=2.0,
+                        help="scripted bot: mean seconds per guess")
+    parser.add_argument('--latency-sd', type=float, default=0.75,
+                        help="scripted bot: deviation of seconds per guess")
+    args = parser.parse_args()
+
+    settings = GameRoundSettings()
+    if args.mode == 'timed':
+        settings.set_timed()
+    elif args.mode == 'survival':
+        settings.set_survival()
+    else:
+        settings.set_infinite()
+    if args.limit is not None:
+        settings.limit = args.limit
+    for name in ('tries', 'bonus', 'penalty', 'chain', 'count_at', 'clue_at'):
+        value = getattr(args, name)
+        if value is not None:
+            setattr(settings, name, value)
+
+    botargs = {}
+    if args.bot == 'scripted':
+        botargs = {'accuracy': args.accuracy, 'mean': args.latency_mean,
+                   'deviation': args.latency_sd}
+
+    report = simulate(settings, args.rounds, args.bot, botargs, args.workers,
+                      args.seed, args.max_items, args.content)
+    print("Settings: " + settings.get_datastring())
+    print(report)
+
+if __name__ == '__main__':
+    main()
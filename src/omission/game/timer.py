@@ -2,52 +2,156 @@
 Game Timer [Omission]
 """
 
-from threading import Timer
+import math
+from threading import RLock
+
+from omission.game.clock import ThreadClock
 
 class GameTimer(object):
     """
     The timer object for a game round.
     """
 
-    def __init__(self, life_signal, length, over_callback=None, tick_callback=None):
+    def __init__(self, life_signal, length, over_callback=None, tick_callback=None,
+                 clock=None):
         """
         Create a new GameTimer. length is the number of seconds. If 0,
-        the GameTimer will be infinite until stopped.
+        the GameTimer will be infinite until stopped. clock is the GameClock
+        that drives the timer, and decides which thread the callbacks run
+        on. By default, this is a ThreadClock.
         """
+        # pylint: disable=R0913
         # The length of the timer.
         self._length = length
         # The function to call when the timer is done.
         self.over_callback = over_callback
         # The function to call on each tick.
         self.tick_callback = tick_callback
-        # Define a one-second timer.
-        self._timer = Timer(1.0, self._timer_step)
-        # The number of seconds that have elapsed.
-        self._elapsed = 0
-        # The last bookmark. Used for tracking time between answers.
-        self._bookmark = 0
+        # The clock that drives our ticks.
+        if clock is None:
+            clock = ThreadClock()
+        self._clock = clock
+        # The pending tick, the clock time it is due at, and its generation.
+        # Each tick scheduled gets a new generation, so a tick that fires
+        # after being cancelled or replaced can tell it is stale.
+        self._event = None
+        self._deadline = 0
+        self._generation = 0
+        # Whether the timer is running.
+        self._running = False
+        # Guards the pending tick against stop()/start() from other threads.
+        self._lock = RLock()
+        # The running time (in seconds, not counting pauses) before the
+        # current run began, and the clock time the current run began at.
+        self._run_time = 0.0
+        self._started = 0.0
+        # The running time of the next tick, and of the next step (the next
+        # tick, or the end of the timer if that comes first).
+        self._next_tick = 1
+        self._due = 1
+        # The time added or removed, so elapsed = running time + offset.
+        self._offset = 0
+        # The last bookmark, as (elapsed, running time).
+        # Used for tracking time between answers.
+        self._bookmark = (0, 0.0)
         # Death signal
         self._alive = True
 
         # Register my death function with the given lifespan signal.
         life_signal(self.die)
 
-    def _timer_step(self):
+    def _timer_step(self, generation):
         """
-        Fires every second, updating the timer object.
+        Fires every second of running time, and when the timer runs out,
+        updating the timer object.
         """
-        self._elapsed += 1
-        if self._length > 0 and self._elapsed >= self._length:
+        with self._lock:
+            # If we were stopped (or rescheduled) just as we fired, ignore
+            # this tick.
+            if not self._running or generation != self._generation:
+                return
+            self._event = None
+            # Count from the exact step, even if we fired a little late,
+            # so the ticks don't drift.
+            self._run_time = self._due
+            self._started = self._deadline
+            tick = self._due >= self._next_tick
+            if tick:
+                self._next_tick += 1
+            done = self._is_done()
+            if done:
+                self._running = False
+            elif not tick:
+                # Time was added since this step was scheduled.
+                self._schedule()
+                return
+
+        if done:
             self._timer_done()
-        else:
-            # If there's still time left...
-            # If we have a tick callback...
-            if self.tick_callback:
-                # Call it now.
-                self.tick_callback()
-            # Elapse another second.
-            self._timer = None
-            self.start()
+            return
+
+        # If there's still time left...
+        # If we have a tick callback...
+        if self.tick_callback:
+            # Call it now.
+            self.tick_callback()
+
+        with self._lock:
+            # Elapse another second, unless the callback stopped (or
+            # restarted) us.
+            if self._running and self._alive and self._event is None:
+                self._schedule()
+
+    def _is_done(self):
+        """
+        Returns True if a finite timer has run out, else False.
+        """
+        # Allow for rounding in the offset.
+        return self._length > 0 and \
+            self.get_elapsed() >= self._length - 1e-9
+
+    def check_done(self):
+        """
+        Returns True if a finite timer has run out, else False. If it has
+        run out, but its last step hasn't fired yet, the timer is finished
+        now instead, so the time runs out at the same point however late
+        the clock fires.
+        """
+        with self._lock:
+            if not self._is_done():
+                return False
+            finish = self._running
+            if finish:
+                # The last step is stale now.
+                self.stop()
+        if finish:
+            self._timer_done()
+        return True
+
+    def _schedule(self):
+        """
+        Schedule the next step, which falls due once the running time
+        reaches the next whole second, or once the timer runs out, if that
+        is sooner.
+        """
+        self._due = float(self._next_tick)
+        if self._length > 0:
+            # Bonuses and penalties move the end off the whole seconds.
+            end = max(self._length - self._offset, self.get_running_time())
+            self._due = min(self._due, end)
+        self._deadline = self._started + (self._due - self._run_time)
+        self._generation += 1
+        generation = self._generation
+        self._event = self._clock.schedule(
+            self._deadline, lambda: self._timer_step(generation))
+
+    def _reschedule(self):
+        """
+        Schedule the next step again, after the time has been changed.
+        """
+        if self._running and self._event is not None:
+            self._clock.cancel(self._event)
+            self._schedule()
 
     def _timer_done(self):
         """
@@ -58,13 +162,28 @@ class GameTimer(object):
             # Call it now.
             self.over_callback()
 
+    def get_running_time(self):
+        """
+        Returns the number of seconds the timer has been running, not
+        counting pauses, bonuses, or penalties.
+        """
+        if self._running:
+            return self._run_time + (self._clock.now() - self._started)
+        return self._run_time
+
+    def get_elapsed(self):
+        """
+        Returns the number of seconds elapsed, counting bonuses and penalties.
+        """
+        return self.get_running_time() + self._offset
+
     def get_remaining_percent(self):
         """
         Returns the number of seconds in the timer as a percentage.
         """
         # If the length is non-zero.
         if self._length > 0:
-            return 100 - int(self._elapsed / self._length * 100)
+            return max(100 - int(self.get_elapsed() / self._length * 100), 0)
         # Otherwise, if this is an infinite timer...
         else:
             # Always return 100%
@@ -72,76 +191,98 @@ class GameTimer(object):
 
     def get_seconds(self):
         """
-        Returns the remaning number of seconds remaining in a finite timer
-        OR the number of seconds elapsed in an infinite timer.
+        Returns the remaning number of whole seconds remaining in a finite
+        timer OR the number of whole seconds elapsed in an infinite timer.
         """
         # If the length is non-zero.
         if self._length > 0:
-            # Return remaining seconds.
-            return self._length - self._elapsed
+            # Return remaining seconds, counting any part of a second.
+            return max(math.ceil(self._length - self.get_elapsed()), 0)
         # Otherwise, if this is an infinite timer...
         else:
             # Return the time elapsed
-            return self._elapsed
-
+            return int(self.get_elapsed())
 
     def add_time(self, seconds):
         """
         Add the given number of seconds to remaining time.
         """
-        # Remove the time from the elapsed variable.
-        self._elapsed -= seconds
-        # If we're less than zero, reset elapsed to zero.
-        if self._elapsed <= 0:
-            self._elapsed = 0
+        with self._lock:
+            elapsed = self.get_elapsed()
+            # Remove the time from the elapsed time, but not below zero.
+            self._offset += max(elapsed - seconds, 0) - elapsed
+            self._reschedule()
 
     def remove_time(self, seconds):
         """
         Remove the given number of seconds from remaining time.
         """
-        # Add the time from the elapsed variable.
-        self._elapsed += seconds
-        # If we're greater than the max, reset elapsed to max.
-        if self._length > 0 and self._elapsed >= self._length:
-            self._elapsed = self._length
+        with self._lock:
+            elapsed = self.get_elapsed()
+            # Add the time to the elapsed time, but not beyond the max.
+            new_elapsed = elapsed + seconds
+            if self._length > 0 and new_elapsed >= self._length:
+                new_elapsed = self._length
+            self._offset += new_elapsed - elapsed
+            self._reschedule()
 
     def bookmark(self):
         """
         Set the bookmark to the current time.
         """
-        self._bookmark = self._elapsed
+        with self._lock:
+            self._bookmark = (self.get_elapsed(), self.get_running_time())
 
     def since_bookmark(self):
         """
-        Return the number of seconds elapsed since the last bookmark.
+        Return the number of seconds elapsed since the last bookmark,
+        counting bonuses and penalties.
+        """
+        return self.get_elapsed() - self._bookmark[0]
+
+    def latency(self):
+        """
+        Return the number of seconds the timer has been running since the
+        last bookmark, not counting bonuses and penalties.
         """
-        return self._elapsed - self._bookmark
+        return self.get_running_time() - self._bookmark[1]
 
     def reset(self):
         """
         Reset the timer.
         """
-        self._elapsed = 0
+        with self._lock:
+            self._offset = -self.get_running_time()
+            self._reschedule()
 
     def stop(self):
         """
         Stop the timer without resetting anything.
         """
-        if self._timer:
-            self._timer.cancel()
-        self._timer = None
+        with self._lock:
+            if self._running:
+                # Keep the part of a second we've run, for when we resume.
+                self._run_time = self.get_running_time()
+            self._running = False
+            if self._event:
+                self._clock.cancel(self._event)
+            self._event = None
+            # A tick already on its way is stale now.
+            self._generation += 1
 
     def start(self):
         """
         Start/resume the timer.
         """
-        if not self._timer:
-            self._timer = Timer(1.0, self._timer_step)
-        if self._alive:
-            self._timer.start()
+        with self._lock:
+            if self._alive and not self._running:
+                self._running = True
+                self._started = self._clock.now()
+                self._schedule()
 
     def die(self):
         """
-        Order the timer to die.
+        Order the timer to die, cancelling any pending tick.
         """
         self._alive = False
+        self.stop()
@@ -9,7 +9,7 @@ from kivy.utils import get_color_from_hex
 
 from omission.data import img_loader
 from omission.interface.helpful import sec_to_timestring, score_to_scorestring
-from omission.game.contentloader import ContentLoader
+from omission.game.clock import KivyClock
 from omission.game.gameround import GameRound, GameMode, GameStatus
 from omission.game.gameround import GameRoundSettings
 
@@ -23,7 +23,7 @@ class Gameplay(BoxLayout):
         Initialize a new Gameplay box.
         """
         super().__init__(**kwargs)
-        self.loader = ContentLoader()
+        self.loader = App.get_running_app().content.get_loader()
         self.settings = GameRoundSettings()
         self.playing = False
         self.gameround = None
@@ -129,7 +129,8 @@ class Gameplay(BoxLayout):
         self._bind_keyboard()
         self.gameround = GameRound(App.get_running_app().set_kill_callback,
                                    self.gameover, self.tick, self.loader,
-                                   self.settings)
+                                   self.settings, prefetch_depth=3,
+                                   clock=KivyClock())
         self.playing = True
         self.gameround.start_round()
         self.update_status(True)
@@ -388,6 +389,8 @@ class Gameplay(BoxLayout):
         App.get_running_app().set_kill_callback(None)
         # Disconnect the keyboard.
         self._unbind_keyboard()
+        # Stop the round's timer and puzzle prefetching.
+        self.gameround.close()
 
         # Check for score logging.
         datastring = self.gameround.settings.get_datastring()
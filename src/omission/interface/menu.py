@@ -206,6 +206,9 @@ class Menu(BoxLayout):
             self.settings.set_infinite(tries)
             App.get_running_app().dataloader.settings.save_infinite(self.settings)
 
+        # Save the settings in the background.
+        App.get_running_app().dataloader.mark_dirty()
+
 class InfoBox(BoxLayout):
     """
     Information about the game.
@@ -244,6 +247,7 @@ class InfoBox(BoxLayout):
 
         if mode != dys:
             App.get_running_app().dataloader.fontloader.set_dyslexic_mode(mode)
+            App.get_running_app().dataloader.mark_dirty()
             popup_message = PopupMessage()
             popup_message.set("Display Mode Changed",
                               "You must restart Omission to apply your changes.")
@@ -262,6 +266,7 @@ class InfoBox(BoxLayout):
             App.get_running_app().dataloader.soundplayer.set_volume(6)
         elif vol_str == 'Vol: High':
             App.get_running_app().dataloader.soundplayer.set_volume(10)
+        App.get_running_app().dataloader.mark_dirty()
 
 class PlayBox(BoxLayout):
     """
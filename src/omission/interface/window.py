@@ -17,10 +17,12 @@ import os.path
 
 import kivy
 from kivy.app import App
+from kivy.clock import Clock
 from kivy.core.window import Window
 from kivy.uix.floatlayout import FloatLayout
 
 from omission.data.data_loader import DataLoader
+from omission.game.contentservice import ContentService
 from omission.interface.credits import Credits
 from omission.interface.game import Gameplay
 from omission.interface.highscore import Highscore
@@ -148,6 +150,8 @@ class OmissionApp(App):
 
         # Create our score loader.
         self.dataloader = DataLoader()
+        # Create our content service. The content is loaded in on_start.
+        self.content = ContentService()
 
     def build_config(self, config):
         """
@@ -187,6 +191,15 @@ class OmissionApp(App):
         # Return the application.
         return omission_app
 
+    def on_start(self):
+        """
+        The application has started. Load the content and the sounds while
+        the menu is up.
+        """
+        self.content.preload()
+        # Wait for the menu's first frame before loading the sounds.
+        Clock.schedule_once(lambda dt: self.dataloader.soundplayer.preload())
+
     def check_resize(self, instance, new_x, new_y):
         """
         Prevent resizing our screen too small if we're not using SDL2.
@@ -213,4 +226,5 @@ class OmissionApp(App):
         """
         if self.kill_callback:
             self.kill_callback()
-        self.dataloader.write_out()
+        # Save anything the background writer hasn't yet.
+        self.dataloader.flush()
@@ -0,0 +1,40 @@
+"""
+Content Loader Tests [Omission]
+"""
+
+import os
+
+from omission.game import contentloader
+from omission.game.contentloader import ContentLoader, cache_paths
+
+def test_caches_in_user_cache_dir(tmp_path, monkeypatch):
+    """
+    The offsets and difficulty caches are written to the user cache
+    directory, not beside the corpus, and are used again from there.
+    """
+    cachedir = tmp_path / "cache"
+    monkeypatch.setattr(contentloader, 'user_cache_dir',
+                        lambda *args: str(cachedir))
+    contentdir = tmp_path / "content"
+    contentdir.mkdir()
+    corpus = contentdir / "content.txt"
+    corpus.write_text("The quick brown fox.\n\nJumps over the lazy dog.\n\n"
+                      "Pack my box with five dozen liquor jugs.\n")
+
+    loader = ContentLoader(str(corpus), True)
+    loader.get_difficulty_index()
+    assert os.listdir(str(contentdir)) == ["content.txt"]
+    for suffix in ("offsets", "difficulty"):
+        assert os.path.exists(cache_paths(str(corpus), suffix)[0])
+
+    # A second load reads the caches rather than building them again.
+    loaded = ContentLoader(str(corpus), True)
+    assert loaded.get_count() == loader.get_count() == 3
+
+def test_cache_names_differ_by_location(tmp_path):
+    """
+    Corpora with the same name in different places get different caches.
+    """
+    first = cache_paths(str(tmp_path / "a" / "content.txt"), "offsets")[0]
+    second = cache_paths(str(tmp_path / "b" / "content.txt"), "offsets")[0]
+    assert first != second
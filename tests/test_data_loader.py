@@ -0,0 +1,79 @@
+"""
+Data Loader Tests [Omission]
+"""
+
+from omission.data.data_loader import DataLoader
+
+def test_compacts_file_without_size(tmp_path):
+    """
+    A data file that was never compacted (so has no SIZ line) is compacted
+    once enough has been appended to it, across many sessions.
+    """
+    path = str(tmp_path / "scores.data")
+    datastring = "T:30:2:1:3:1:3:2:1"
+    scores = []
+    for session in range(200):
+        loader = DataLoader(path, debounce=0)
+        loader.journal.compact_threshold = 1024
+        loader.add_score(datastring, session + 1, "Player" + str(session))
+        scores.append(session + 1)
+        loader.flush()
+
+    with open(path, 'rb') as datafile:
+        data = datafile.read()
+    assert data.startswith(b'SIZ=')
+    # Without compaction, every session's score would still be in the file.
+    assert len(data) < 2 * 1024
+
+    loader = DataLoader(path)
+    assert [score for score, _ in loader.get_scores(datastring)] == \
+        sorted(scores, reverse=True)[:8]
+
+def test_failed_write_keeps_scores(tmp_path, monkeypatch):
+    """
+    Scores whose write failed are written by the next one.
+    """
+    path = str(tmp_path / "scores.data")
+    datastring = "T:30:2:1:3:1:3:2:1"
+    loader = DataLoader(path, debounce=60)
+    append = loader.journal.append
+    def fail(record):
+        monkeypatch.setattr(loader.journal, 'append', append)
+        raise OSError("No space left on device")
+    monkeypatch.setattr(loader.journal, 'append', fail)
+
+    loader.add_score(datastring, 500, "Alice")
+    loader.flush()
+    # The failed write is due again.
+    assert loader.writer._dirty # pylint: disable=W0212
+    loader.add_score(datastring, 300, "Bob")
+    loader.flush()
+
+    assert DataLoader(path).get_scores(datastring) == [(500, "Alice"),
+                                                       (300, "Bob")]
+
+def test_compaction_keeps_others_settings(tmp_path):
+    """
+    Compacting keeps the settings last saved by any instance, rather than
+    those this instance happens to hold.
+    """
+    path = str(tmp_path / "scores.data")
+    first = DataLoader(path, debounce=60)
+    second = DataLoader(path, debounce=60)
+    second.soundplayer.set_volume(3)
+    second.mark_dirty()
+    second.flush()
+
+    first.add_score("T:30:2:1:3:1:3:2:1", 100, "Alice")
+    first.flush()
+    first.write_out(True)
+    assert DataLoader(path).soundplayer.get_volume() == 3
+
+    # Settings this instance changed still win, being saved last.
+    first.fontloader.set_dyslexic_mode(True)
+    first.mark_dirty()
+    first.flush()
+    first.write_out(True)
+    loaded = DataLoader(path)
+    assert loaded.soundplayer.get_volume() == 3
+    assert loaded.fontloader.get_dyslexic_mode()
@@ -0,0 +1,81 @@
+"""
+Round Journal Tests [Omission]
+"""
+
+import random
+
+from omission.game.clock import VirtualClock
+from omission.game.contentloader import ContentLoader
+from omission.game.gameround import GameMode, GameRound, GameRoundSettings
+from omission.game.journal import JournalWriter, replay
+
+def _record(path, loader, seed):
+    """
+    Play a short round, journaling it to path. Returns its score.
+    """
+    clock = VirtualClock()
+    gameround = GameRound(lambda die: None, None, None, loader,
+                          GameRoundSettings(), clock=clock,
+                          journal=JournalWriter(path), seed=seed)
+    gameround.start_round()
+    for letter in "etaoinshrdlu":
+        clock.advance(1.5)
+        gameround.answer(letter, True)
+    gameround.close()
+    return gameround.get_score()[0]
+
+class _LateClock(VirtualClock):
+    """
+    A VirtualClock that fires every callback a little after its deadline,
+    as the live clocks can.
+    """
+
+    def __init__(self, lateness):
+        super().__init__()
+        self.lateness = lateness
+
+    def schedule(self, deadline, callback):
+        return super().schedule(deadline + self.lateness, callback)
+
+def test_replay_late_clock(tmp_path):
+    """
+    Rounds played on a clock that fires its ticks and game over late
+    still replay to the same score.
+    """
+    loader = ContentLoader()
+    path = str(tmp_path / "round.journal")
+    for seed in range(40):
+        rng = random.Random(seed)
+        settings = GameRoundSettings()
+        if seed % 2:
+            settings.mode = GameMode.Infinite
+        clock = _LateClock(0.015)
+        over = []
+        gameround = GameRound(lambda die: None, lambda: over.append(True),
+                              None, loader, settings, clock=clock,
+                              journal=JournalWriter(path), seed=seed)
+        gameround.start_round()
+        for _ in range(60):
+            clock.advance(rng.uniform(0.2, 2.5))
+            if over:
+                break
+            answer = gameround.get_solution()[0]
+            if rng.random() < 0.2:
+                answer = "z" if answer != "z" else "q"
+            gameround.answer(answer, True)
+        gameround.close()
+        score = gameround.get_score()[0]
+        with open(path, 'rb') as journalfile:
+            assert replay(journalfile.read(), loader) == (score, score)
+
+def test_journal_path_reused(tmp_path):
+    """
+    Journaling a second round to the same path replaces the first, and
+    the journal still replays.
+    """
+    loader = ContentLoader()
+    path = str(tmp_path / "round.journal")
+    _record(path, loader, 1)
+    score = _record(path, loader, 2)
+    with open(path, 'rb') as journalfile:
+        assert replay(journalfile.read(), loader) == (score, score)
@@ -0,0 +1,67 @@
+"""
+Sound Effect Mixer Tests [Omission]
+"""
+
+from omission.data.mixer import Mixer, STEAL_NONE
+
+class FakeSound(object):
+    """
+    Stands in for a Kivy Sound, playing until stopped.
+    """
+
+    def __init__(self):
+        self.state = 'stop'
+        self.volume = 1
+
+    def play(self):
+        """
+        Start playing.
+        """
+        self.state = 'play'
+
+    def stop(self):
+        """
+        Stop playing.
+        """
+        self.state = 'stop'
+
+def test_pool_grows_when_overlapping():
+    """
+    A pool asks for another voice only when every voice is busy, up to its
+    limit, and steals the oldest voice meanwhile.
+    """
+    mixer = Mixer(0.5)
+    requests = []
+    mixer.add_pool('ding', [FakeSound()], limit=2,
+                   grow=lambda: requests.append('ding'))
+    pool = mixer.get_pool('ding')
+
+    assert mixer.trigger('ding')
+    assert requests == []
+    assert mixer.trigger('ding')
+    assert requests == ['ding'] and pool.steals == 1
+    # Only one voice is asked for at a time.
+    assert mixer.trigger('ding')
+    assert requests == ['ding']
+
+    mixer.add_voice('ding', FakeSound())
+    assert len(pool) == 2
+    assert mixer.trigger('ding') and pool.steals == 2
+    # At the limit, the pool stops growing.
+    assert mixer.trigger('ding')
+    assert requests == ['ding']
+
+def test_volume_applied_once():
+    """
+    New voices get the current volume, and dropped triggers are counted.
+    """
+    mixer = Mixer(1)
+    mixer.add_pool('gameover', [FakeSound()], STEAL_NONE)
+    mixer.set_volume(0.3)
+    mixer.add_pool('bell', [FakeSound()], limit=2, grow=lambda: None)
+    mixer.add_voice('bell', FakeSound())
+    assert all(voice.volume == 0.3 for voice in mixer.get_pool('bell')._voices) # pylint: disable=W0212
+    assert mixer.trigger('gameover')
+    assert not mixer.trigger('gameover')
+    assert mixer.get_pool('gameover').drops == 1
+    assert mixer.get_latency('gameover')[0] == 2
@@ -0,0 +1,25 @@
+"""
+Simulation Tests [Omission]
+"""
+
+from omission.game.gameround import GameRoundSettings
+from omission.game.simulate import SimulationReport, _percentile, simulate
+
+def test_seed_independent_of_workers():
+    """
+    A seeded simulation plays the same rounds however many workers it has.
+    """
+    settings = GameRoundSettings()
+    settings.set_timed()
+    one = simulate(settings, 120, workers=1, seed=7)
+    three = simulate(settings, 120, workers=3, seed=7)
+    assert one.scores == three.scores
+    assert one.lengths == three.lengths
+
+def test_percentile():
+    """
+    Percentiles interpolate between the sorted values.
+    """
+    assert _percentile([1, 2, 3, 4, 5], 0.5) == 3
+    assert _percentile([0, 10], 0.1) == 1
+    assert "p10 1.0" in SimulationReport._summary(list(range(11))) # pylint: disable=W0212
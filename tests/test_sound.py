@@ -0,0 +1,89 @@
+"""
+Sound Playback Tests [Omission]
+"""
+
+from omission.data import sound
+from omission.data.sound import SoundPlayer
+
+class FakeSound(object):
+    """
+    Stands in for a Kivy Sound, playing until stopped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.state = 'stop'
+        self.volume = 1
+
+    def play(self):
+        """
+        Start playing.
+        """
+        self.state = 'play'
+
+    def stop(self):
+        """
+        Stop playing.
+        """
+        self.state = 'stop'
+
+class FakeCache(object):
+    """
+    Stands in for an AudioCache, with a decoded copy of every sound, or of
+    none.
+    """
+
+    def __init__(self, decoded):
+        self.decoded = decoded
+
+    def get(self, source):
+        """
+        Return the path to load the sound at source from.
+        """
+        return source + ".wav" if self.decoded else source
+
+def _wait(player):
+    """
+    Wait for the player's loading thread to finish, if it is running.
+    """
+    thread = player._thread # pylint: disable=W0212
+    if thread is not None:
+        thread.join()
+
+def _preloaded(monkeypatch, decoded):
+    """
+    Return a SoundPlayer with every sound loaded, and the paths loaded.
+    """
+    loaded = []
+    def load(path):
+        loaded.append(path)
+        return FakeSound(path)
+    monkeypatch.setattr(sound.SoundLoader, 'load', load)
+    player = SoundPlayer(FakeCache(decoded))
+    player.preload()
+    _wait(player)
+    return player, loaded
+
+def test_voices_preloaded_from_cache(monkeypatch):
+    """
+    With decoded copies, every voice is loaded up front, from the copy,
+    so an overlapping alarm doesn't cut off the one before.
+    """
+    player, loaded = _preloaded(monkeypatch, True)
+    assert len(loaded) == sum(voices for _, voices, _ in sound.SOUNDS.values())
+    assert all(path.endswith(".wav") for path in loaded)
+    player.play_alarm()
+    player.play_alarm()
+    assert player.mixer.get_pool('alarm').steals == 0
+
+def test_voices_grow_without_cache(monkeypatch):
+    """
+    Without decoded copies, each file is decoded once up front, and the
+    other voices are loaded as they are needed.
+    """
+    player, loaded = _preloaded(monkeypatch, False)
+    assert len(loaded) == len(sound.SOUNDS)
+    player.play_alarm()
+    player.play_alarm()
+    _wait(player)
+    assert len(player.mixer.get_pool('alarm')) == 2
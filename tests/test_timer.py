@@ -0,0 +1,64 @@
+"""
+Game Timer Tests [Omission]
+"""
+
+from omission.game.clock import VirtualClock
+from omission.game.timer import GameTimer
+
+def test_ends_on_time_after_bonus():
+    """
+    A bonus that leaves the timer off the whole seconds still ends it the
+    moment its time runs out, not at the next tick.
+    """
+    clock = VirtualClock()
+    ended = []
+    ticks = []
+    timer = GameTimer(lambda die: None, 10, lambda: ended.append(clock.now()),
+                      lambda: ticks.append(clock.now()), clock=clock)
+    timer.start()
+    clock.advance(0.5)
+    # Only half a second has elapsed, so only that much can be given back.
+    timer.add_time(3)
+    clock.advance(9.9)
+    assert not ended
+    assert timer.get_seconds() == 1
+    clock.advance(0.2)
+    assert ended == [10.5]
+    assert timer.get_seconds() == 0
+    assert timer.get_remaining_percent() == 0
+    # The ticks still fall on whole seconds of running time.
+    assert ticks == [float(second) for second in range(1, 11)]
+
+def test_ends_at_once_on_penalty():
+    """
+    A penalty that uses up the rest of the time ends the timer at once.
+    """
+    clock = VirtualClock()
+    ended = []
+    timer = GameTimer(lambda die: None, 10, lambda: ended.append(clock.now()),
+                      clock=clock)
+    timer.start()
+    clock.advance(2.25)
+    timer.remove_time(20)
+    clock.advance(0)
+    assert ended == [2.25]
+
+def test_stale_tick_ignored():
+    """
+    A tick that fires after the timer was stopped and started again is
+    ignored, and doesn't leave the current tick impossible to cancel.
+    """
+    clock = VirtualClock()
+    ticks = []
+    timer = GameTimer(lambda die: None, 10, None,
+                      lambda: ticks.append(clock.now()), clock=clock)
+    timer.start()
+    # Take the tick as a scheduler thread would, just before it runs.
+    stale = clock._heap[0][2] # pylint: disable=W0212
+    timer.stop()
+    timer.start()
+    stale()
+    assert ticks == []
+    assert clock.pending() == 1
+    timer.stop()
+    assert clock.pending() == 0